@@ -5,9 +5,23 @@ This script will generate a visualization of the Mandelbrot set.
 @date: 2016-07-27
 """
 
-from math import pi,sin,cos
+import sys
+import json
+import time
+import argparse
+from math import pi,sin,cos,log,log10
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
 from PySide import QtGui, QtCore
 
+# The peak memory is only available on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 # ----------------------------------------------------------------------------------
 class PlotRange:
@@ -32,12 +46,259 @@ class PlotRange:
         self.zSize = zSize
 
 # ----------------------------------------------------------------------------------
-class ColorMap:
+def classicColors(N, intensity):
     """
-    This class creates the color map to be used for plotting the Mandelbrot set.
+    The classic color scheme, blue to green to red with a darker shade of blue
+    at the low end.
 
     NOTE! This is perhaps not the best way to create a color map but it will do
     for now.
+
+    Arguments:
+    N         -- Number of colors in color map (int).
+    intensity -- The color intensity for the RGB color, max 225 (int).
+
+    Return:
+    The colors (list of RGB tuples).
+    """
+
+    # The color map list
+    colorMap = []
+
+    # Calculate color ranges
+    tRange = N//2
+    bRange = N - tRange
+    fRange = tRange//3
+
+    # Interpolate between Blue and Green
+    for i in range(tRange):
+        alpha = (i/float(tRange))*0.5*pi
+        blue = int(intensity*cos(alpha))
+        green = int(intensity*sin(alpha))
+        color = (0,green,blue)
+
+        colorMap.append(color)
+
+    # Interpolate between Green and Red
+    for i in range(bRange):
+        alpha = (i/float(bRange))*0.5*pi
+        green = int(intensity*cos(alpha))
+        red = int(intensity*sin(alpha))
+        color = (red,green,0)
+
+        colorMap.append(color)
+
+    # Make the upper end transition to a darker shade of blue
+    d = 0.05
+    for i in range(fRange):
+        darkness = d + ((1.-d)/fRange)*i
+        color = colorMap[i]
+        green = int(darkness*color[1])
+        blue = int(darkness*color[2])
+        colorMap[i] = (0,green,blue)
+
+    return colorMap
+
+def interpolateGradient(points, N, intensity):
+    """
+    Interpolate colors from the control points of a gradient. All N colors are
+    interpolated linearly in one pass over the color positions.
+
+    Arguments:
+    points    -- The control points (position,(r,g,b)) with increasing
+                 positions from 0 to 1 and colors in [0,255] (list of tuples).
+    N         -- Number of colors in color map (int).
+    intensity -- The color intensity, the colors are scaled by intensity/255
+                 (int).
+
+    Return:
+    The colors (list of RGB tuples).
+    """
+
+    positions = [point[0] for point in points]
+    scale = intensity/255.
+    last = len(points) - 1
+
+    def color(x):
+        # The control points around x
+        k = min(max(bisect_right(positions,x),1),last)
+        x0, c0 = points[k-1]
+        x1, c1 = points[k]
+        t = 0.
+        if (x1 > x0):
+            t = min(max((x - x0)/(x1 - x0),0.),1.)
+
+        return tuple([int(scale*(c0[m] + t*(c1[m] - c0[m]))) for m in range(3)])
+
+    return [color(n/float(max(1,N-1))) for n in range(N)]
+
+# ----------------------------------------------------------------------------------
+class Palette(object):
+    """
+    This class is a generated color map. The colors are kept both as RGB
+    tuples for getColor and packed in an array of bytes r,g,b,r,g,b,... e.g.
+    for writing images.
+
+    Palettes are made by getPalette and shared, so they must not be changed.
+    """
+
+    def __init__(self, scheme, N, intensity, colors):
+        """
+        Constructor.
+
+        Arguments:
+        scheme    -- The name of the color scheme (string).
+        N         -- Number of colors (int).
+        intensity -- The color intensity (int).
+        colors    -- The colors (list of RGB tuples).
+        """
+
+        self.scheme = scheme
+        self.N = N
+        self.intensity = intensity
+        self.colors = colors
+        self.packed = array("B",[value for color in colors for value in color])
+
+# The color schemes, functions (N, intensity) -> list of RGB tuples
+colorSchemes = {}
+colorSchemeNames = []
+
+# The generated palettes by (scheme, N, intensity), least recently used first
+paletteCache = OrderedDict()
+paletteCacheSize = 64
+
+def registerColorScheme(name, function):
+    """
+    Make a color scheme available by name. A scheme registered again replaces
+    the old one.
+
+    Arguments:
+    name      -- The name of the scheme (string).
+    function  -- The function (N, intensity) returning the colors (list of RGB
+                 tuples).
+    """
+
+    if name not in colorSchemes:
+        colorSchemeNames.append(name)
+    colorSchemes[name] = function
+
+    # Forget the palettes of a replaced scheme
+    for key in [key for key in paletteCache if key[0] == name]:
+        del paletteCache[key]
+
+def gradientPoints(points):
+    """
+    Check and convert the control points of a gradient.
+
+    Arguments:
+    points    -- The control points (position,(r,g,b)), see
+                 interpolateGradient (list of tuples).
+
+    Return:
+    The control points sorted by position (list of tuples). A ValueError is
+    raised if there are less than two points or a color is not three numbers.
+    """
+
+    points = sorted([(float(x),tuple([int(c) for c in color])) for x, color in points])
+    if (len(points) < 2):
+        raise ValueError("A gradient needs at least two control points")
+    for x, color in points:
+        if (len(color) != 3):
+            raise ValueError("A control point needs a position and three colors")
+
+    return points
+
+def registerGradient(name, points):
+    """
+    Make a gradient available as a color scheme.
+
+    Arguments:
+    name      -- The name of the scheme (string).
+    points    -- The control points (position,(r,g,b)), see
+                 interpolateGradient (list of tuples).
+    """
+
+    points = gradientPoints(points)
+    registerColorScheme(name,lambda N, intensity: interpolateGradient(points,N,intensity))
+
+def loadGradients(fileName):
+    """
+    Load gradients from a JSON file and register them as color schemes. The
+    file maps names to control points [position, r, g, b], e.g.
+
+      {"fire": [[0.0, 0, 0, 0], [0.6, 255, 0, 0], [1.0, 255, 255, 0]]}
+
+    Arguments:
+    fileName  -- The file name (string).
+
+    Return:
+    The names of the loaded gradients (list of strings). Errors in the file
+    are printed and no gradient of the file is registered.
+    """
+
+    try:
+        with open(fileName) as f:
+            gradients = json.load(f)
+        if not isinstance(gradients, dict):
+            raise ValueError("The file must map names to control points")
+
+        # Check all gradients before any of them is registered
+        gradients = dict([(name,gradientPoints([(point[0],point[1:]) for point in points]))
+                for name, points in gradients.items()])
+    except (IOError, ValueError, TypeError, IndexError, AttributeError) as error:
+        print("Error: Cannot load gradients from %s: %s" % (fileName,error))
+        return []
+
+    for name, points in gradients.items():
+        registerGradient(name,points)
+
+    return sorted(gradients)
+
+def getPalette(scheme, N, intensity):
+    """
+    Get the palette of a color scheme. Palettes are generated once and then
+    taken from the cache.
+
+    Arguments:
+    scheme    -- The name of a registered color scheme (string).
+    N         -- Number of colors (int).
+    intensity -- The color intensity (int).
+
+    Return:
+    The palette (Palette). An unknown scheme gives the classic scheme with a
+    warning.
+    """
+
+    if scheme not in colorSchemes:
+        print("Warning: Unknown color scheme %s, using the classic colors!" % scheme)
+        scheme = "Classic"
+
+    key = (scheme,N,intensity)
+    palette = paletteCache.pop(key,None)
+    if palette is None:
+        colors = colorSchemes[scheme](N,intensity)
+
+        # The last color is for the points in the set
+        colors[-1] = (0,0,0)
+        palette = Palette(scheme,N,intensity,colors)
+
+    # Most recently used last
+    paletteCache[key] = palette
+    while (len(paletteCache) > paletteCacheSize):
+        paletteCache.popitem(last=False)
+
+    return palette
+
+registerColorScheme("Classic",classicColors)
+registerGradient("Grayscale",[(0.,(0,0,0)),(1.,(255,255,255))])
+registerGradient("Fire",[(0.,(0,0,0)),(0.4,(200,0,0)),(0.75,(255,160,0)),
+                         (1.,(255,255,220))])
+
+# ----------------------------------------------------------------------------------
+class ColorMap:
+    """
+    This class holds the color map to be used for plotting the Mandelbrot set.
+    The colors come from a palette of a color scheme, see getPalette.
     """
 
     def __init__(self):
@@ -45,57 +306,24 @@ class ColorMap:
         Constructor.
         """
 
-    def generate(self, N, intensity):
+    def generate(self, N, intensity, scheme="Classic"):
         """
         This function generates the color map.
 
         Arguments:
         N         -- Number of colors in color map (int).
         intensity -- The color intensity for the RGB color, max 225 (int).
+        scheme    -- The name of the color scheme (string).
 
         Return:
         None.
 
         """
 
-        # The color map list
-        self.colorMap = []
-
-        # Calculate color ranges
+        self.palette = getPalette(scheme,N,intensity)
+        self.scheme = self.palette.scheme
         self.N = N
-        tRange = N/2
-        bRange = N - tRange
-        fRange = tRange/3
-
-        # Interpolate between Blue and Green
-        for i in range(tRange):
-            alpha = (i/float(tRange))*0.5*pi
-            blue = int(intensity*cos(alpha))
-            green = int(intensity*sin(alpha))
-            color = (0,green,blue)
-
-            self.colorMap.append(color)
-
-        # Interpolate between Green and Red
-        for i in range(bRange):
-            alpha = (i/float(bRange))*0.5*pi
-            green = int(intensity*cos(alpha))
-            red = int(intensity*sin(alpha))
-            color = (red,green,0)
-
-            self.colorMap.append(color)
-
-        # Make the upper end transition to a darker shade of blue
-        d = 0.05
-        for i in range(fRange):
-            darkness = d + ((1.-d)/fRange)*i
-            color = self.colorMap[i]
-            green = int(darkness*color[1])
-            blue = int(darkness*color[2])
-            self.colorMap[i] = (0,green,blue)
-
-        # Replace the last color with black
-        self.colorMap[-1] = (0,0,0)
+        self.colorMap = self.palette.colors
 
     def getColor(self, n):
         """
@@ -115,223 +343,1901 @@ class ColorMap:
             exit(2)
 
 # ----------------------------------------------------------------------------------
-class SenderObject(QtCore.QObject):
+class Kernel(object):
     """
-    This is a simple class which will allow me to send a signal from another
-    class which itself does not inherit from QObject.
+    This class is the base class for the iteration formula of a fractal, the
+    kernel. A kernel declares the iteration function, the bailout radius and
+    optionally the derivative of the iteration function.
+
+    The Mandelbrot type set of a kernel is plotted by iterating from z = c and
+    the Julia type set by iterating from z = pixel with a fixed c. Every kernel
+    is run by all calculations of the MandelBase class.
+
+    New kernels are made available by name with registerKernel.
     """
 
     # Attributes
-    itrSignal = QtCore.Signal(int)
-    maxSignal = QtCore.Signal(int)
+    name = ""
+    bailout = 2.
 
-    def __init__(self):
-        """
-        Constructor.
+    # The bailout radius used for distance estimation. It is larger than the
+    # normal bailout radius since the estimate is only accurate for large |z|.
+    distanceBailout = 1000.
+
+    # The derivative of the iteration function with respect to z, or None if
+    # the iteration function is not complex differentiable.
+    derivative = None
+
+    def step(self, z, c):
         """
+        One step of the iteration function.
 
-        super(SenderObject,self).__init__()
+        Arguments:
+        z -- The current value (complex).
+        c -- The constant (complex).
 
-# ----------------------------------------------------------------------------------
-class MandelBase(object):
-    """
-    This class is the base class for the Mandelbrot calculation and is used to
-    hide member functions not directly accessed by the user.
+        Return:
+        The next value (complex).
+        """
 
-    The MandelbrotImage class inherits this class and is then used as the user
-    interface.
-    """
+        raise NotImplementedError
 
-    def __init__(self):
+    def iterate(self, z, c, N):
         """
-        Constructor.
+        Iterate the function from the start value z and return the number of
+        iterations before |z| exceeds the bailout radius. The start value counts
+        as the first iteration. The maximum number of iterations are limited
+        to N.
 
-        Set the complex to bitmap mapping values.
+        This generic version calls step for each iteration. Kernels override it
+        with a faster version.
+
+        Arguments:
+        z -- The start value (complex).
+        c -- The constant (complex).
+        N -- The maximum number of iterations (int).
 
         Return:
-        None
+        Number of iterations (int).
         """
 
-        # Create a sender object for emitting signals
-        self.sender = SenderObject()
+        bailout = self.bailout
+        step = self.step
+
+        # Iteration counter
+        n = 1
 
+        # Iterate
+        while (abs(z) < bailout) and (n < N):
+            n = n + 1
+            z = step(z,c)
 
-    def mandelbrotIterations(self,c,N=100):
-        """
-        This member function does the Mandelbrot iterations.
+        return n
 
-        Iterate the function:
-        z(n+1) = z(n)^2 + c
-        for the complex number c and return the number of iterations before |z(n+1)|>2
+    def distance(self, z, c, N, dc):
+        """
+        Estimate the distance from the start value to the border of the set.
+        The derivative dz of the iterated value is tracked along with z. For
+        the Mandelbrot type set the derivative is taken with respect to c
+        (dc = 1) and for the Julia type set with respect to the start value
+        (dc = 0).
 
-        The maximum number of iterations are limited to N.
+        The kernel must have a derivative.
 
         Arguments:
-        c -- test value (complex) to see if it belongs to the Mandelbrot set.
+        z  -- The start value (complex).
+        c  -- The constant (complex).
+        N  -- The maximum number of iterations (int).
+        dc -- The derivative of c, 1 for Mandelbrot and 0 for Julia sets (float).
 
         Return:
-        Number of iterations until the iteration yields |z(n+1)|>2. The maximum number
-        of iterations are limited to N.
+        The estimated distance in the complex plane, zero if the iteration does
+        not escape within N iterations, and the number of iterations (tuple).
         """
 
-        # Initialize start value for iteration
-        z = complex(0.,0.)
+        bailout = self.distanceBailout
+        step = self.step
+        derivative = self.derivative
 
-        # Iteration counter
-        n = 0
+        # Iteration counter and derivative
+        n = 1
+        dz = complex(1.,0.)
 
         # Iterate
-        while (abs(z) < 2.) and (n < N):
+        while (abs(z) < bailout) and (n < N):
             n = n + 1
-            z = z*z + c
-
-        return n
+            dz = derivative(z)*dz + dc
+            z = step(z,c)
 
+        return self.estimate(z,dz), n
 
-    def getPixelMap(self,noPixels,plotRange):
+    def estimate(self, z, dz):
         """
-        Get the pixel to complex number map for the bitmap.
+        The distance estimate from the last value and derivative of the
+        iteration.
 
         Arguments:
-        noPixels     -- The number of pixels per bitmap side (int).
-        plotRange    -- The range in the complex plane to plot.
+        z  -- The last value of the iteration (complex).
+        dz -- The last value of the derivative (complex).
 
         Return:
-        List of complex numbers associate with the pixels.
+        The estimated distance, zero if z has not escaped (float).
         """
 
-        # Initialize the pixel map
-        pixelMap = []
-        for i in range(noPixels):
-            row = []
-            for j in range(noPixels):
-                row.append(complex(0.,0.))
+        absZ = abs(z)
+        absDz = abs(dz)
+        if (absZ < self.distanceBailout) or (absDz == 0.):
+            return 0.
 
-            pixelMap.append(row)
+        return 0.5*absZ*log(absZ)/absDz
 
-        # Iterate through all pixels
-        cDelta = plotRange.zSize/float(noPixels)
-        for i in range(noPixels):
-            for j in range(noPixels):
+# ----------------------------------------------------------------------------------
+class MultibrotKernel(Kernel):
+    """
+    The kernel z(n+1) = z(n)^d + c for an integer power d > 1. The power 2 gives
+    the Mandelbrot set.
+    """
 
-                cReal = plotRange.corner.real + 0.5*cDelta + i*cDelta
-                cImag = plotRange.corner.imag - 0.5*cDelta - j*cDelta
-                pixelMap[i][j] = complex(cReal,cImag)
+    def __init__(self, d=2):
+        """
+        Constructor.
 
-        # Return list
-        return pixelMap
+        Arguments:
+        d         -- The power of the iteration function (int).
+        """
 
+        self.d = d
+        if (d == 2):
+            self.name = "Mandelbrot"
+            self.iterate = self.iterate2
+        elif (d == 3):
+            self.name = "Multibrot d=3"
+            self.iterate = self.iterate3
+        else:
+            self.name = "Multibrot d=%d" % d
+            self.iterate = self.iterateD
 
-    def fillImage(self, plotRange, noPixels, iterN, colorMap):
+    def step(self, z, c):
         """
-        This function fills the image with colors representing the mandelbrot
-        iterations.
+        One step of the iteration function.
+        """
+
+        return z**self.d + c
+
+    def derivative(self, z):
+        """
+        The derivative d*z^(d-1) of the iteration function.
 
         Arguments:
-        plotRange    -- The range in the complex plane to plot.
-        noPixels     -- The number of pixels per bitmap side (int).
-        iterN        -- Max number of manderbrot iterations.
-        colorMap     -- The color map object.
+        z -- The current value (complex).
 
         Return:
-        The generated image.
+        The derivative (complex).
         """
 
-        # Create image object
-        image = QtGui.QImage(noPixels,noPixels,QtGui.QImage.Format_RGB32)
+        return self.d*z**(self.d-1)
 
-        # iteration number
-        itrNo = 1
+    def iterate2(self, z, c, N):
+        """
+        The iterate function for d = 2 using explicit real and imaginary parts.
+        """
 
-        # Get list of complex numbers
-        complexList = self.getPixelMap(noPixels,plotRange)
+        x = z.real
+        y = z.imag
+        cr = c.real
+        ci = c.imag
+        x2 = x*x
+        y2 = y*y
+        bailout2 = self.bailout*self.bailout
 
-        # Send max number of iterations to progress bar
-        self.sender.maxSignal.emit(noPixels*noPixels)
+        n = 1
+        while (x2 + y2 < bailout2) and (n < N):
+            n = n + 1
+            y = 2.*x*y + ci
+            x = x2 - y2 + cr
+            x2 = x*x
+            y2 = y*y
 
-        # Iterate through all complex numbers and calculate the Mandelbrot
-        # iterations.
-        for i in range(noPixels):
-            for j in range(noPixels):
-                # Get complex number
-                c = complexList[i][j]
+        return n
 
-                # Calculate number of iterations
-                mIter = self.mandelbrotIterations(c,iterN)
+    def iterate3(self, z, c, N):
+        """
+        The iterate function for d = 3 using explicit real and imaginary parts.
+        """
 
-                # Get color
-                color = colorMap.getColor(mIter-1)
+        x = z.real
+        y = z.imag
+        cr = c.real
+        ci = c.imag
+        x2 = x*x
+        y2 = y*y
+        bailout2 = self.bailout*self.bailout
 
-                # Plot Pixel
-                if (i > noPixels) or (j > noPixels):
-                    # Complex number is out of range
-                    print("Error: Pixel index out of range!")
-                else:
-                    # Paint one pixel
-                    image.setPixel(i,j,QtGui.qRgb(color[0],color[1],color[2]))
+        n = 1
+        while (x2 + y2 < bailout2) and (n < N):
+            n = n + 1
+            x, y = x*(x2 - 3.*y2) + cr, y*(3.*x2 - y2) + ci
+            x2 = x*x
+            y2 = y*y
 
-                # Emit signal and increase iteration number
-                self.sender.itrSignal.emit(itrNo)
-                itrNo += 1
+        return n
+
+    def iterateD(self, z, c, N):
+        """
+        The iterate function for any power d.
+        """
+
+        d = self.d
+        bailout = self.bailout
+
+        n = 1
+        while (abs(z) < bailout) and (n < N):
+            n = n + 1
+            z = z**d + c
+
+        return n
+
+    def distance(self, z, c, N, dc):
+        """
+        The distance function for any power d, see Kernel.distance.
+        """
+
+        d = self.d
+        bailout = self.distanceBailout
+
+        n = 1
+        dz = complex(1.,0.)
+        while (abs(z) < bailout) and (n < N):
+            n = n + 1
+            zd = z**(d-1)
+            dz = d*zd*dz + dc
+            z = zd*z + c
 
-        return image
+        return self.estimate(z,dz), n
 
 # ----------------------------------------------------------------------------------
-class MandelbrotImage(MandelBase):
+class BurningShipKernel(Kernel):
     """
-    This class generate an image of the mandelbrot set.
-
-    This is the interface for other applications.
+    The kernel z(n+1) = (|Re z(n)| + i|Im z(n)|)^2 + c.
     """
 
-    def __init__(self):
+    name = "Burning ship"
+
+    def step(self, z, c):
         """
-        Constructor.
+        One step of the iteration function.
         """
 
-        # Init base class
-        super(MandelbrotImage,self).__init__()
+        return complex(abs(z.real),abs(z.imag))**2 + c
 
-
-    def generate(self, noPixels, colorMap, plotRange, depth):
+    def iterate(self, z, c, N):
+        """
+        The iterate function using explicit real and imaginary parts.
         """
-        This function fills the image with the range plotRange of the Mandelbrot
-        set. The depth of the colors, i.e. the number of colors used for
-        representation, is the same as the imaximum number of Mandelbrot iterations.
 
-        Arguments:
-        noPixels     -- Image size, pixels x pixels (int)
-        colorMap     -- The color map used for the image.
-        plotRange    -- The range in the complex plane to plot.
-        depth        -- The maximum number of Mandelbrot iterations.
+        x = z.real
+        y = z.imag
+        cr = c.real
+        ci = c.imag
+        x2 = x*x
+        y2 = y*y
+        bailout2 = self.bailout*self.bailout
 
+        n = 1
+        while (x2 + y2 < bailout2) and (n < N):
+            n = n + 1
+            y = abs(2.*x*y) + ci
+            x = x2 - y2 + cr
+            x2 = x*x
+            y2 = y*y
 
-        Return:
-        The generated image.
+        return n
+
+# ----------------------------------------------------------------------------------
+class TricornKernel(Kernel):
+    """
+    The kernel z(n+1) = conj(z(n))^2 + c.
+    """
+
+    name = "Tricorn"
+
+    def step(self, z, c):
+        """
+        One step of the iteration function.
         """
 
-        # Fill image and return
-        return self.fillImage(plotRange,noPixels,depth,colorMap)
+        return z.conjugate()**2 + c
 
+    def iterate(self, z, c, N):
+        """
+        The iterate function using explicit real and imaginary parts.
+        """
 
-# === Main ===================================================================
-if __name__ == "__main__":
+        x = z.real
+        y = z.imag
+        cr = c.real
+        ci = c.imag
+        x2 = x*x
+        y2 = y*y
+        bailout2 = self.bailout*self.bailout
 
-    print("Generating an image of the mandelbrot set")
+        n = 1
+        while (x2 + y2 < bailout2) and (n < N):
+            n = n + 1
+            y = -2.*x*y + ci
+            x = x2 - y2 + cr
+            x2 = x*x
+            y2 = y*y
 
-    # Variables
-    depth = 200
-    intensity = 200
-    noPixels = 500
-    plotRange = PlotRange(complex(-2.,2.),4.)
+        return n
 
-    # Create a color map
-    colorMap = ColorMap()
-    colorMap.generate(depth,intensity)
+# ----------------------------------------------------------------------------------
+# The registered kernels by name, and the names in order of registration
+kernels = {}
+kernelNames = []
 
-    # Create a image of the mandelbrot set
-    mandelbrot = MandelbrotImage(noPixels,colorMap)
-    mandelbrot.generate(plotRange,depth)
-    mandelbrot.save("slask.bmp")
+def registerKernel(kernel):
+    """
+    Make a kernel available by its name.
+
+    Arguments:
+    kernel       -- The kernel object (Kernel).
+
+    Return:
+    None.
+    """
+
+    if kernel.name not in kernels:
+        kernelNames.append(kernel.name)
+    kernels[kernel.name] = kernel
+
+def getKernel(name):
+    """
+    Get a registered kernel.
+
+    Arguments:
+    name         -- The name of the kernel (string).
+
+    Return:
+    The kernel object (Kernel).
+    """
 
+    return kernels[name]
+
+# Built-in kernels
+mandelbrotKernel = MultibrotKernel(2)
+registerKernel(mandelbrotKernel)
+registerKernel(MultibrotKernel(3))
+registerKernel(MultibrotKernel(4))
+registerKernel(MultibrotKernel(5))
+registerKernel(BurningShipKernel())
+registerKernel(TricornKernel())
+
+# ----------------------------------------------------------------------------------
+def peakMemory():
+    """
+    Get the peak resident memory of the process.
+
+    Return:
+    The peak memory in MB, or None if not available (float).
+    """
+
+    if resource is None:
+        return None
+
+    # The size is in bytes on Mac OS and in kB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if (sys.platform == "darwin"):
+        return peak/(1024.*1024.)
+    return peak/1024.
+
+def profileCall(function, args=(), fileName=None, limit=25):
+    """
+    Run a function under cProfile. The statistics are saved to a file for
+    e.g. pstats or snakeviz, or printed sorted by cumulative time.
+
+    Arguments:
+    function     -- The function to profile.
+    args         -- The arguments of the function (tuple).
+    fileName     -- The file to save the statistics to, or None to print them
+                    (string).
+    limit        -- The number of functions to print (int).
+
+    Return:
+    The return value of the function.
+    """
+
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function,*args)
+    finally:
+        if fileName is None:
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(limit)
+        else:
+            profile.dump_stats(fileName)
+
+# ----------------------------------------------------------------------------------
+class RenderStats(object):
+    """
+    This class is the statistics record of a render. The calculation counts
+    the pixels and iterations and times the phases of the render, e.g.
+    "reference", "calculate" and "paint".
+
+    The pixels of the render are either calculated, and then escaped or in the
+    interior of the set, or skipped. Skipped pixels are filled by subdivision
+    or reused from a previous image.
+    """
+
+    # The calculation engine
+    engine = "python"
+
+    def __init__(self, noPixels=0, kernel=None, precision="double", juliaC=None,
+                 distance=False):
+        """
+        Constructor.
+
+        Arguments:
+        noPixels     -- The total number of pixels of the render (int).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        precision    -- The precision of the calculation (string).
+        juliaC       -- The constant of the Julia set, or None (complex).
+        distance     -- The render is in distance estimation mode (bool).
+        """
+
+        if kernel is None:
+            kernel = mandelbrotKernel
+
+        self.kernel = kernel.name
+        self.precision = precision
+        self.juliaC = juliaC
+        self.distance = bool(distance)
+        self.noPixels = noPixels
+
+        # Counts
+        self.calculated = 0
+        self.interior = 0
+        self.iterations = 0
+
+        # Times in seconds
+        self.phases = OrderedDict()
+        self.start = time.time()
+        self.totalTime = 0.
+        self.peakMemory = None
+
+    def count(self, calculated, interior, iterations):
+        """
+        Add counts of calculated pixels.
+
+        Arguments:
+        calculated   -- The number of calculated pixels (int).
+        interior     -- The number of them in the interior of the set (int).
+        iterations   -- The number of iterations executed (int).
+        """
+
+        self.calculated += calculated
+        self.interior += interior
+        self.iterations += iterations
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Time a phase of the render, used as "with stats.timer(phase):". The
+        times of a phase timed more than once are added.
+
+        Arguments:
+        phase        -- The name of the phase (string).
+        """
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases[phase] = self.phases.get(phase,0.) + time.time() - start
+
+    def finish(self):
+        """
+        Set the total time and the peak memory at the end of the render.
+        """
+
+        self.totalTime = time.time() - self.start
+        self.peakMemory = peakMemory()
+
+    def escaped(self):
+        return self.calculated - self.interior
+
+    def fractal(self):
+        """
+        The name of the fractal, e.g. "Mandelbrot" or "Mandelbrot Julia".
+        """
+
+        if self.juliaC is None:
+            return self.kernel
+        return "%s Julia" % self.kernel
+
+    def skipped(self):
+        return self.noPixels - self.calculated
+
+    def iterationsPerSecond(self):
+        """
+        The iteration rate of the calculation phase.
+
+        Return:
+        Iterations per second, or None if not known (float).
+        """
+
+        seconds = self.phases.get("calculate",0.)
+        if (self.iterations == 0) or (seconds <= 0.):
+            return None
+
+        return self.iterations/seconds
+
+    def asDict(self):
+        """
+        Get the statistics as a dictionary, e.g. for logging as JSON.
+
+        Return:
+        The statistics (dict).
+        """
+
+        juliaC = None
+        if self.juliaC is not None:
+            juliaC = [self.juliaC.real,self.juliaC.imag]
+
+        return {"engine": self.engine,
+                "kernel": self.kernel,
+                "juliaC": juliaC,
+                "distance": self.distance,
+                "precision": self.precision,
+                "pixels": self.noPixels,
+                "calculated": self.calculated,
+                "escaped": self.escaped(),
+                "interior": self.interior,
+                "skipped": self.skipped(),
+                "iterations": self.iterations,
+                "iterationsPerSecond": self.iterationsPerSecond(),
+                "phases": dict(self.phases),
+                "totalTime": self.totalTime,
+                "peakMemory": self.peakMemory}
+
+    def __str__(self):
+        """
+        A one line summary of the statistics.
+        """
+
+        phases = ", ".join(["%s %.2f" % item for item in self.phases.items()])
+        fractal = self.fractal()
+        if self.distance:
+            fractal += " distance"
+        text = "%s %s %s: %.2f s (%s), %d px calculated (%d escaped, %d interior), %d skipped" % \
+               (self.engine,self.precision,fractal,self.totalTime,phases,
+                self.calculated,self.escaped(),self.interior,self.skipped())
+
+        rate = self.iterationsPerSecond()
+        if rate is not None:
+            text += ", %.2f M itr/s" % (rate*1e-6)
+        if self.peakMemory is not None:
+            text += ", peak %.0f MB" % self.peakMemory
+
+        return text
+
+# ----------------------------------------------------------------------------------
+class RenderCancelled(Exception):
+    """
+    This exception is raised by the calculation when the render is cancelled,
+    see MandelBase.cancelled.
+    """
+
+# ----------------------------------------------------------------------------------
+class SenderObject(QtCore.QObject):
+    """
+    This is a simple class which will allow me to send a signal from another
+    class which itself does not inherit from QObject.
+    """
+
+    # Attributes
+    itrSignal = QtCore.Signal(int)
+    maxSignal = QtCore.Signal(int)
+    statsSignal = QtCore.Signal(object)
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        super(SenderObject,self).__init__()
+
+# ----------------------------------------------------------------------------------
+class MandelBase(object):
+    """
+    This class is the base class for the Mandelbrot calculation and is used to
+    hide member functions not directly accessed by the user.
+
+    The MandelbrotImage class inherits this class and is then used as the user
+    interface.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+
+        Set the complex to bitmap mapping values.
+
+        Return:
+        None
+        """
+
+        # Create a sender object for emitting signals
+        self.sender = SenderObject()
+
+        # Progress counter for the itrSignal
+        self.itrNo = 1
+
+        # Emit the progress once per column instead of once per pixel. This is
+        # used when rendering in another thread than the GUI, where each signal
+        # is queued to the GUI thread.
+        self.columnProgress = False
+
+        # Set from another thread to stop the calculation, which then raises
+        # RenderCancelled at the next column
+        self.cancelled = False
+
+        # The statistics of the last render
+        self.stats = RenderStats()
+
+
+    def mandelbrotIterations(self,c,N=100):
+        """
+        This member function does the Mandelbrot iterations.
+
+        Iterate the function:
+        z(n+1) = z(n)^2 + c
+        for the complex number c and return the number of iterations before |z(n+1)|>2
+
+        The maximum number of iterations are limited to N.
+
+        Arguments:
+        c -- test value (complex) to see if it belongs to the Mandelbrot set.
+
+        Return:
+        Number of iterations until the iteration yields |z(n+1)|>2. The maximum number
+        of iterations are limited to N.
+        """
+
+        # Initialize start value for iteration
+        z = complex(0.,0.)
+
+        # Iteration counter
+        n = 0
+
+        # Iterate
+        while (abs(z) < 2.) and (n < N):
+            n = n + 1
+            z = z*z + c
+
+        return n
+
+
+    def referenceOrbit(self, plotRange, N=100):
+        """
+        Calculate the Mandelbrot iterations of the center of the plot range in
+        high precision. The orbit is the reference for perturbationIterations.
+
+        Arguments:
+        plotRange    -- The range in the complex plane to plot.
+        N            -- The maximum number of iterations (int).
+
+        Return:
+        The orbit z(0)=0, z(1)=c, ... as double precision values, ending when
+        |z|>2 or after N iterations (list of complex).
+        """
+
+        # The decimal module is only needed for deep zooms
+        from decimal import Decimal, localcontext
+
+        # Enough digits to resolve a pixel relative to the reference value
+        digits = 20 + max(0,int(-log10(plotRange.zSize)))
+
+        orbit = [complex(0.,0.)]
+        with localcontext() as context:
+            context.prec = digits
+
+            # The center of the plot range
+            half = Decimal(plotRange.zSize)/2
+            cReal = Decimal(plotRange.corner.real) + half
+            cImag = Decimal(plotRange.corner.imag) - half
+
+            # Iterate
+            x = Decimal(0)
+            y = Decimal(0)
+            while (len(orbit) <= N):
+                x, y = x*x - y*y + cReal, 2*x*y + cImag
+                orbit.append(complex(float(x),float(y)))
+                if (abs(orbit[-1]) > 2.):
+                    break
+
+        return orbit
+
+
+    def perturbationIterations(self,dc,orbit,N=100):
+        """
+        This member function does the Mandelbrot iterations for a point close
+        to a reference point with a known high precision orbit.
+
+        Only the difference d(n) = z(n) - Z(n) to the reference orbit Z(n) is
+        iterated,
+        d(n+1) = 2*Z(n)*d(n) + d(n)^2 + dc
+        which keeps the precision of the small difference dc between the point
+        and the reference point. When z(n) gets closer to zero than to the
+        reference orbit, or the reference orbit ends, the iteration continues
+        from the beginning of the reference orbit with d(n) = z(n).
+
+        The number of iterations is counted as in mandelbrotIterations.
+
+        Arguments:
+        dc    -- The difference between the point and the reference point
+                 (complex).
+        orbit -- The reference orbit from referenceOrbit (list of complex).
+
+        Return:
+        Number of iterations until the iteration yields |z(n+1)|>2. The maximum number
+        of iterations are limited to N.
+        """
+
+        # Position in the reference orbit and difference to the orbit
+        m = 0
+        last = len(orbit) - 1
+        d = complex(0.,0.)
+
+        # Iteration counter
+        n = 0
+
+        # Iterate
+        while (n < N):
+            d = (2.*orbit[m] + d)*d + dc
+            m = m + 1
+            n = n + 1
+
+            z = orbit[m] + d
+            if (abs(z) >= 2.):
+                break
+
+            # Continue from the beginning of the reference orbit
+            if (abs(z) < abs(d)) or (m == last):
+                d = z
+                m = 0
+
+        return n
+
+
+    def getPixelMap(self,noPixels,plotRange):
+        """
+        Get the pixel to complex number map for the bitmap.
+
+        Arguments:
+        noPixels     -- The number of pixels per bitmap side (int).
+        plotRange    -- The range in the complex plane to plot.
+
+        Return:
+        List of complex numbers associate with the pixels.
+        """
+
+        # Initialize the pixel map
+        pixelMap = []
+        for i in range(noPixels):
+            row = []
+            for j in range(noPixels):
+                row.append(complex(0.,0.))
+
+            pixelMap.append(row)
+
+        # Iterate through all pixels
+        cDelta = plotRange.zSize/float(noPixels)
+        for i in range(noPixels):
+            for j in range(noPixels):
+
+                cReal = plotRange.corner.real + 0.5*cDelta + i*cDelta
+                cImag = plotRange.corner.imag - 0.5*cDelta - j*cDelta
+                pixelMap[i][j] = complex(cReal,cImag)
+
+        # Return list
+        return pixelMap
+
+
+    def newIterationBuffer(self,noPixels):
+        """
+        Create an empty iteration buffer.
+
+        The buffer is indexed the same way as the pixel map, i.e. buffer[i][j]
+        where i is the column and j is the row of the pixel.
+
+        Arguments:
+        noPixels     -- The number of pixels per bitmap side (int).
+
+        Return:
+        List of lists of iteration numbers, all set to zero.
+        """
+
+        return [[0]*noPixels for i in range(noPixels)]
+
+
+    def distanceIndex(self, dist, cDelta, noPixels, iterN):
+        """
+        Convert an estimated distance to the border of the set into a color
+        index. The index takes the place of the number of iterations so the
+        distance is painted with the color map in the same way.
+
+        Points in the set get the index iterN. A distance of one pixel or less
+        gives the index next to it and the index then falls logarithmically
+        down to 1 at a distance of the image width.
+
+        Arguments:
+        dist         -- The estimated distance, zero in the set (float).
+        cDelta       -- The pixel size in the complex plane (float).
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of Mandelbrot iterations.
+
+        Return:
+        The color index [1,iterN] (int).
+        """
+
+        if (dist <= 0.):
+            return iterN
+
+        n = iterN - 1 - int((iterN-2)*log(1. + dist/cDelta)/log(1. + noPixels))
+        return max(1,min(iterN-1,n))
+
+
+    def calcIterations(self, iterations, plotRange, noPixels, iterN, columns, rows,
+                       juliaC=None, kernel=None, distances=None, reference=None,
+                       offset=(0,0)):
+        """
+        This function calculates the Mandelbrot iterations for a rectangular
+        part of the iteration buffer. Only the pixels in the given columns and
+        rows are calculated, all other values in the buffer are left untouched.
+        Pixels in the region that already are calculated, i.e. are non-zero,
+        are skipped.
+
+        In distance estimation mode the distance from each pixel to the border
+        of the set is estimated and stored in the distance buffer. The
+        iteration buffer then gets a color index for the distance instead of
+        the number of iterations, see distanceIndex.
+
+        With a reference orbit the pixels are iterated by perturbation of the
+        orbit, see perturbationIterations. This is the deep zoom precision for
+        the Mandelbrot set, where the pixel size is too small to be added to
+        the corner coordinates in double precision.
+
+        The buffers may cover only a tile of the image. The offset is then the
+        pixel of the first buffer element, while columns and rows still are
+        pixels of the whole image.
+
+        Arguments:
+        iterations   -- The iteration buffer to fill (list of lists).
+        plotRange    -- The range in the complex plane to plot.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of Mandelbrot iterations.
+        columns      -- The pixel columns to calculate (iterable of int).
+        rows         -- The pixel rows to calculate (iterable of int).
+        juliaC       -- The constant of the Julia set to calculate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distances    -- The distance buffer to fill in distance estimation mode,
+                        or None (list of lists).
+        reference    -- The reference orbit of the plot range center for the
+                        deep zoom precision, or None (list of complex).
+        offset       -- The pixel (column,row) of buffer element [0][0] (tuple).
+
+        Return:
+        None.
+        """
+
+        # Pixel size in the complex plane
+        cDelta = plotRange.zSize/float(noPixels)
+
+        # Iteration and distance functions of the kernel
+        if kernel is None:
+            kernel = mandelbrotKernel
+        iterate = kernel.iterate
+        distance = kernel.distance
+        if juliaC is None:
+            dc = 1.
+        else:
+            dc = 0.
+
+        # Counts for the statistics
+        noCalculated = 0
+        noInterior = 0
+        noIterations = 0
+
+        # Iterate through the pixels of the region and calculate the
+        # Mandelbrot iterations.
+        di, dj = offset
+        for i in columns:
+            if self.cancelled:
+                raise RenderCancelled()
+
+            cReal = plotRange.corner.real + 0.5*cDelta + i*cDelta
+            column = iterations[i-di]
+            for j in rows:
+                if column[j-dj]:
+                    continue
+
+                cImag = plotRange.corner.imag - 0.5*cDelta - j*cDelta
+                z = complex(cReal,cImag)
+                if juliaC is None:
+                    c = z
+                else:
+                    c = juliaC
+
+                if reference is not None:
+                    # Iterate the difference to the plot range center
+                    delta = complex((0.5+i)*cDelta - 0.5*plotRange.zSize,
+                                    0.5*plotRange.zSize - (0.5+j)*cDelta)
+                    n = self.perturbationIterations(delta,reference,iterN)
+                    noIterations += n
+                elif distances is None:
+                    n = iterate(z,c,iterN)
+                    noIterations += n
+                else:
+                    dist, count = distance(z,c,iterN,dc)
+                    noIterations += count
+                    distances[i-di][j-dj] = dist
+                    n = self.distanceIndex(dist,cDelta,noPixels,iterN)
+                column[j-dj] = n
+
+                noCalculated += 1
+                if (n >= iterN):
+                    noInterior += 1
+
+                # Emit signal and increase iteration number
+                if not self.columnProgress:
+                    self.sender.itrSignal.emit(self.itrNo)
+                self.itrNo += 1
+
+            if self.columnProgress:
+                self.sender.itrSignal.emit(self.itrNo-1)
+
+        self.stats.count(noCalculated,noInterior,noIterations)
+
+
+    def calcBlock(self, iterations, plotRange, noPixels, iterN, i0, i1, j0, j1,
+                  juliaC=None, kernel=None, distances=None, reference=None,
+                  minBlock=4, offset=(0,0)):
+        """
+        This function calculates the Mandelbrot iterations for the block of
+        pixels [i0,i1) x [j0,j1) by subdivision. The border of the block is
+        calculated first. If all border pixels have the same number of
+        iterations the inside of the block is filled with that number, since a
+        region of the Mandelbrot set enclosed by a border of one iteration
+        number contains no other iteration numbers. Otherwise the block is
+        split into four blocks which are treated the same way.
+
+        In distance estimation mode the iteration numbers are color indices of
+        distance bands. The bands are narrow close to the border of the set, so
+        blocks far from the border are filled while blocks on the border are
+        refined down to single pixels. The filled distances are the mean of the
+        border distances.
+
+        Arguments:
+        iterations   -- The iteration buffer to fill (list of lists).
+        plotRange    -- The range in the complex plane to plot.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of Mandelbrot iterations.
+        i0, i1       -- The column range of the block (int).
+        j0, j1       -- The row range of the block (int).
+        juliaC       -- The constant of the Julia set to calculate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distances    -- The distance buffer to fill in distance estimation mode,
+                        or None (list of lists).
+        reference    -- The reference orbit of the plot range center for the
+                        deep zoom precision, or None (list of complex).
+        minBlock     -- Blocks this size or smaller are calculated without
+                        further subdivision (int).
+        offset       -- The pixel (column,row) of buffer element [0][0], see
+                        calcIterations (tuple).
+
+        Return:
+        None.
+        """
+
+        # Calculate the border of the block
+        self.calcIterations(iterations,plotRange,noPixels,iterN,range(i0,i1),
+                [j0,j1-1],juliaC,kernel,distances,reference,offset)
+        self.calcIterations(iterations,plotRange,noPixels,iterN,[i0,i1-1],
+                range(j0,j1),juliaC,kernel,distances,reference,offset)
+
+        # There is no inside of the block
+        if (i1-i0 <= 2) or (j1-j0 <= 2):
+            return
+
+        # The block in buffer indices
+        li0, li1 = i0-offset[0], i1-offset[0]
+        lj0, lj1 = j0-offset[1], j1-offset[1]
+
+        # Collect the iteration numbers of the border
+        border = set(iterations[li0][lj0:lj1]) | set(iterations[li1-1][lj0:lj1])
+        for i in range(li0,li1):
+            border.add(iterations[i][lj0])
+            border.add(iterations[i][lj1-1])
+
+        if (len(border) == 1):
+            # Fill the inside of the block
+            value = border.pop()
+            for i in range(li0+1,li1-1):
+                iterations[i][lj0+1:lj1-1] = [value]*(lj1-lj0-2)
+
+            # Fill the inside of the distance buffer
+            if distances is not None:
+                border = distances[li0][lj0:lj1] + distances[li1-1][lj0:lj1]
+                for i in range(li0+1,li1-1):
+                    border.append(distances[i][lj0])
+                    border.append(distances[i][lj1-1])
+                dist = sum(border)/len(border)
+                for i in range(li0+1,li1-1):
+                    distances[i][lj0+1:lj1-1] = [dist]*(lj1-lj0-2)
+
+            # Emit signal and increase iteration number
+            self.itrNo += (i1-i0-2)*(j1-j0-2)
+            self.sender.itrSignal.emit(self.itrNo-1)
+
+        elif (i1-i0 <= minBlock) and (j1-j0 <= minBlock):
+            # Small block, calculate the inside
+            self.calcIterations(iterations,plotRange,noPixels,iterN,
+                    range(i0+1,i1-1),range(j0+1,j1-1),juliaC,kernel,distances,
+                    reference,offset)
+
+        else:
+            # Split the block into four blocks
+            im = (i0+i1)//2
+            jm = (j0+j1)//2
+            for bi0, bi1 in ((i0,im),(im,i1)):
+                for bj0, bj1 in ((j0,jm),(jm,j1)):
+                    self.calcBlock(iterations,plotRange,noPixels,iterN,
+                            bi0,bi1,bj0,bj1,juliaC,kernel,distances,reference,
+                            minBlock,offset)
+
+
+    def calcSubdivided(self, iterations, plotRange, noPixels, iterN, guide,
+                       juliaC=None, kernel=None, distances=None, reference=None,
+                       blockSize=16):
+        """
+        This function calculates the Mandelbrot iterations for the whole
+        iteration buffer, guided by an approximation of the iteration numbers,
+        e.g. resampled from a parent image.
+
+        The image is divided into blocks. Blocks where the guide is uniform are
+        likely to be uniform also in the new image and are calculated first by
+        subdivision (see calcBlock). Blocks where the guide is not uniform
+        contain a border of the Mandelbrot set and are calculated pixel by
+        pixel. Without a guide all blocks are calculated by subdivision.
+
+        Arguments:
+        iterations   -- The iteration buffer to fill (list of lists).
+        plotRange    -- The range in the complex plane to plot.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of Mandelbrot iterations.
+        guide        -- The approximate iteration buffer, or None (list of lists).
+        juliaC       -- The constant of the Julia set to calculate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distances    -- The distance buffer to fill in distance estimation mode,
+                        or None (list of lists).
+        reference    -- The reference orbit of the plot range center for the
+                        deep zoom precision, or None (list of complex).
+        blockSize    -- The side length of the blocks in pixels (int).
+
+        Return:
+        None.
+        """
+
+        # Divide the image into blocks and check if the guide is uniform
+        blocks = []
+        for i0 in range(0,noPixels,blockSize):
+            i1 = min(i0+blockSize,noPixels)
+            for j0 in range(0,noPixels,blockSize):
+                j1 = min(j0+blockSize,noPixels)
+
+                values = set()
+                if guide is not None:
+                    for i in range(i0,i1):
+                        values.update(guide[i][j0:j1])
+
+                blocks.append((len(values) > 1,i0,i1,j0,j1))
+
+        # Uniform blocks first
+        blocks.sort()
+
+        for mixed,i0,i1,j0,j1 in blocks:
+            if mixed:
+                self.calcIterations(iterations,plotRange,noPixels,iterN,
+                        range(i0,i1),range(j0,j1),juliaC,kernel,distances,reference)
+            else:
+                self.calcBlock(iterations,plotRange,noPixels,iterN,i0,i1,j0,j1,
+                        juliaC,kernel,distances,reference)
+
+
+    def resampleIterations(self, iterations, plotRange, noPixels, newPlotRange,
+                           newNoPixels):
+        """
+        Resample an iteration buffer to another plot range and image size. Each
+        new pixel gets the iteration number of the nearest pixel in the
+        original buffer. Pixels outside the original plot range get the number
+        of the nearest border pixel.
+
+        Arguments:
+        iterations   -- The iteration buffer to resample (list of lists).
+        plotRange    -- The plot range of the iteration buffer.
+        noPixels     -- The number of pixels per side of the buffer (int).
+        newPlotRange -- The plot range to resample to.
+        newNoPixels  -- The number of pixels per side to resample to (int).
+
+        Return:
+        The resampled iteration buffer (list of lists).
+        """
+
+        # Pixel sizes in the complex plane
+        cDelta = plotRange.zSize/float(noPixels)
+        scale = newPlotRange.zSize/float(newNoPixels)/cDelta
+
+        # Position of the new corner in pixels of the original buffer
+        offsetI = (newPlotRange.corner.real - plotRange.corner.real)/cDelta
+        offsetJ = (plotRange.corner.imag - newPlotRange.corner.imag)/cDelta
+
+        # Index of the nearest original pixel for each new column and row
+        columns = [min(noPixels-1,max(0,int(offsetI + (k+0.5)*scale)))
+                   for k in range(newNoPixels)]
+        rows = [min(noPixels-1,max(0,int(offsetJ + (k+0.5)*scale)))
+                for k in range(newNoPixels)]
+
+        return [[iterations[i][j] for j in rows] for i in columns]
+
+
+    def paintImage(self, image, iterations, colorMap, columns, rows):
+        """
+        This function paints a rectangular part of the image with the colors
+        representing the Mandelbrot iterations in the iteration buffer.
+
+        Arguments:
+        image        -- The image to paint (QImage).
+        iterations   -- The iteration buffer (list of lists).
+        colorMap     -- The color map object.
+        columns      -- The pixel columns to paint (iterable of int).
+        rows         -- The pixel rows to paint (iterable of int).
+
+        Return:
+        None.
+        """
+
+        for i in columns:
+            column = iterations[i]
+            for j in rows:
+                # Get color
+                color = colorMap.getColor(column[j]-1)
+
+                # Paint one pixel
+                image.setPixel(i,j,QtGui.qRgb(color[0],color[1],color[2]))
+
+
+    def calcView(self, plotRange, noPixels, iterN, guide=None, juliaC=None,
+                 kernel=None, distance=False, precision="double"):
+        """
+        This function calculates the iteration buffer of a whole view, or the
+        estimated distances to the border of the set in distance estimation
+        mode. No image is painted, which makes the function usable also
+        without a graphical user interface.
+
+        Arguments:
+        plotRange    -- The range in the complex plane to plot.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of manderbrot iterations.
+        guide        -- Optional approximation of the iteration buffer used to
+                        speed up the calculation (list of lists).
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+        precision    -- The precision of the calculation, "double" or "deep"
+                        (string).
+
+        Return:
+        The iteration buffer and the distance buffer, None if not in distance
+        estimation mode (tuple).
+        """
+
+        # A new statistics record
+        self.stats = RenderStats(noPixels*noPixels,kernel,precision,juliaC,distance)
+
+        # Create the iteration and distance buffers
+        iterations = self.newIterationBuffer(noPixels)
+        distances = None
+        if distance:
+            distances = self.newIterationBuffer(noPixels)
+
+        # The reference orbit for the deep zoom precision
+        reference = None
+        if (precision == "deep"):
+            with self.stats.timer("reference"):
+                reference = self.referenceOrbit(plotRange,iterN)
+
+        # Send max number of iterations to progress bar
+        self.itrNo = 1
+        self.sender.maxSignal.emit(noPixels*noPixels)
+
+        # Calculate the Mandelbrot iterations for all pixels. The distance
+        # estimation is always refined by subdivision.
+        allPixels = range(noPixels)
+        with self.stats.timer("calculate"):
+            if (guide is None) and (distances is None):
+                self.calcIterations(iterations,plotRange,noPixels,iterN,allPixels,
+                        allPixels,juliaC,kernel,None,reference)
+            else:
+                self.calcSubdivided(iterations,plotRange,noPixels,iterN,guide,juliaC,
+                        kernel,distances,reference)
+
+        self.stats.finish()
+        return iterations, distances
+
+
+    def calcTile(self, plotRange, noPixels, iterN, i0, i1, j0, j1, juliaC=None,
+                 kernel=None, distance=False, precision="double", blockSize=16):
+        """
+        This function calculates the iteration buffer of the tile [i0,i1) x
+        [j0,j1) of a view, the same way as calcView calculates the whole view
+        without a guide. The tiles of a view can then be calculated separately
+        and stitched together.
+
+        In distance estimation mode the tile is subdivided in blocks of
+        blockSize starting at the tile corner. A view stitched from tiles is
+        equal to the view from calcView when the tile corners are multiples of
+        blockSize.
+
+        Arguments:
+        plotRange    -- The range in the complex plane of the whole view.
+        noPixels     -- The number of pixels per bitmap side of the view (int).
+        iterN        -- Max number of manderbrot iterations.
+        i0, i1       -- The column range of the tile (int).
+        j0, j1       -- The row range of the tile (int).
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+        precision    -- The precision of the calculation, "double" or "deep"
+                        (string).
+        blockSize    -- The side length of the blocks in pixels (int).
+
+        Return:
+        The iteration buffer and the distance buffer of the tile, indexed from
+        the tile corner, the distance buffer is None if not in distance
+        estimation mode (tuple).
+        """
+
+        # A new statistics record
+        self.stats = RenderStats((i1-i0)*(j1-j0),kernel,precision,juliaC,distance)
+
+        # Create the iteration and distance buffers of the tile
+        iterations = [[0]*(j1-j0) for i in range(i0,i1)]
+        distances = None
+        if distance:
+            distances = [[0.]*(j1-j0) for i in range(i0,i1)]
+
+        # The reference orbit for the deep zoom precision
+        reference = None
+        if (precision == "deep"):
+            with self.stats.timer("reference"):
+                reference = self.referenceOrbit(plotRange,iterN)
+
+        # Send max number of iterations to progress bar
+        self.itrNo = 1
+        self.sender.maxSignal.emit((i1-i0)*(j1-j0))
+
+        # Calculate the Mandelbrot iterations of the tile
+        offset = (i0,j0)
+        with self.stats.timer("calculate"):
+            if distances is None:
+                self.calcIterations(iterations,plotRange,noPixels,iterN,range(i0,i1),
+                        range(j0,j1),juliaC,kernel,None,reference,offset)
+            else:
+                for bi0 in range(i0,i1,blockSize):
+                    for bj0 in range(j0,j1,blockSize):
+                        self.calcBlock(iterations,plotRange,noPixels,iterN,bi0,
+                                min(bi0+blockSize,i1),bj0,min(bj0+blockSize,j1),
+                                juliaC,kernel,distances,reference,4,offset)
+
+        self.stats.finish()
+        return iterations, distances
+
+
+    def fillImage(self, plotRange, noPixels, iterN, colorMap, guide=None,
+                  juliaC=None, kernel=None, distance=False, precision="double"):
+        """
+        This function fills the image with colors representing the mandelbrot
+        iterations, or the estimated distance to the border of the set in
+        distance estimation mode.
+
+        Arguments:
+        plotRange    -- The range in the complex plane to plot.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of manderbrot iterations.
+        colorMap     -- The color map object.
+        guide        -- Optional approximation of the iteration buffer used to
+                        speed up the calculation (list of lists).
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+        precision    -- The precision of the calculation, "double" or "deep"
+                        (string).
+
+        Return:
+        The generated image, the iteration buffer and the distance buffer, None
+        if not in distance estimation mode (tuple).
+        """
+
+        # Create image object
+        image = QtGui.QImage(noPixels,noPixels,QtGui.QImage.Format_RGB32)
+
+        # Calculate the view
+        iterations, distances = self.calcView(plotRange,noPixels,iterN,guide,juliaC,
+                kernel,distance,precision)
+
+        # Paint all pixels
+        allPixels = range(noPixels)
+        with self.stats.timer("paint"):
+            self.paintImage(image,iterations,colorMap,allPixels,allPixels)
+
+        self.stats.finish()
+        self.sender.statsSignal.emit(self.stats)
+
+        return image, iterations, distances
+
+
+    def shiftImage(self, plotRange, noPixels, iterN, colorMap, image, iterations,
+                   dx, dy, juliaC=None, kernel=None, distances=None,
+                   precision="double"):
+        """
+        This function shifts an already calculated image by (dx,dy) pixels. The
+        iteration numbers of the pixels still visible after the shift are
+        reused and only the newly exposed strips of pixels are calculated.
+
+        Arguments:
+        plotRange    -- The range in the complex plane of the shifted image.
+        noPixels     -- The number of pixels per bitmap side (int).
+        iterN        -- Max number of manderbrot iterations.
+        colorMap     -- The color map object. Must be the one used for image.
+        image        -- The image to shift (QImage).
+        iterations   -- The iteration buffer of the image (list of lists).
+        dx           -- The shift in pixels along the columns (int).
+        dy           -- The shift in pixels along the rows (int).
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distances    -- The distance buffer of the image in distance estimation
+                        mode, or None (list of lists).
+        precision    -- The precision of the calculation, "double" or "deep"
+                        (string).
+
+        Return:
+        The shifted image, iteration buffer and distance buffer (tuple).
+        """
+
+        # A new statistics record, the reused pixels count as skipped
+        self.stats = RenderStats(noPixels*noPixels,kernel,precision,juliaC,
+                distances is not None)
+
+        # Shift the iteration buffer, pixels moved in from outside are marked
+        # with zero and calculated below.
+        shifted = self.newIterationBuffer(noPixels)
+        for i in range(max(0,dx),min(noPixels,noPixels+dx)):
+            shifted[i][max(0,dy):min(noPixels,noPixels+dy)] = \
+                    iterations[i-dx][max(0,-dy):min(noPixels,noPixels-dy)]
+
+        # Shift the distance buffer
+        shiftedDistances = None
+        if distances is not None:
+            shiftedDistances = self.newIterationBuffer(noPixels)
+            for i in range(max(0,dx),min(noPixels,noPixels+dx)):
+                shiftedDistances[i][max(0,dy):min(noPixels,noPixels+dy)] = \
+                        distances[i-dx][max(0,-dy):min(noPixels,noPixels-dy)]
+
+        # The exposed columns span all rows while the exposed rows only span
+        # the remaining columns.
+        if (dx > 0):
+            newColumns = range(0,dx)
+            oldColumns = range(dx,noPixels)
+        else:
+            newColumns = range(noPixels+dx,noPixels)
+            oldColumns = range(0,noPixels+dx)
+        if (dy > 0):
+            newRows = range(0,dy)
+        else:
+            newRows = range(noPixels+dy,noPixels)
+        allPixels = range(noPixels)
+
+        # The reference orbit for the deep zoom precision
+        reference = None
+        if (precision == "deep"):
+            with self.stats.timer("reference"):
+                reference = self.referenceOrbit(plotRange,iterN)
+
+        # Send max number of iterations to progress bar
+        self.itrNo = 1
+        self.sender.maxSignal.emit(len(newColumns)*noPixels + len(oldColumns)*len(newRows))
+
+        # Calculate the exposed strips
+        with self.stats.timer("calculate"):
+            self.calcIterations(shifted,plotRange,noPixels,iterN,newColumns,allPixels,
+                    juliaC,kernel,shiftedDistances,reference)
+            self.calcIterations(shifted,plotRange,noPixels,iterN,oldColumns,newRows,
+                    juliaC,kernel,shiftedDistances,reference)
+
+        # Move the old image content and paint the exposed strips
+        with self.stats.timer("paint"):
+            newImage = QtGui.QImage(noPixels,noPixels,QtGui.QImage.Format_RGB32)
+            painter = QtGui.QPainter(newImage)
+            painter.drawImage(dx,dy,image)
+            painter.end()
+            self.paintImage(newImage,shifted,colorMap,newColumns,allPixels)
+            self.paintImage(newImage,shifted,colorMap,oldColumns,newRows)
+
+        self.stats.finish()
+        self.sender.statsSignal.emit(self.stats)
+
+        return newImage, shifted, shiftedDistances
+
+# ----------------------------------------------------------------------------------
+class MandelbrotImage(MandelBase):
+    """
+    This class generate an image of the mandelbrot set.
+
+    This is the interface for other applications.
+    """
+
+    # Class attributes
+    # ----------------
+    # The deep zoom precision is used when the pixel size relative to the
+    # coordinates of the plot range is smaller than this limit. Double precision
+    # resolves about 2e-16 but the error grows with the number of iterations.
+    deepLimit = 1e-12
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        # Init base class
+        super(MandelbrotImage,self).__init__()
+
+        # The last generated view, kept for reuse when the view is moved
+        self.image = None
+        self.iterations = None
+        self.plotRange = None
+        self.noPixels = 0
+        self.depth = 0
+        self.juliaC = None
+        self.kernel = mandelbrotKernel
+
+        # The estimated distances to the border of the set of the last view, in
+        # distance estimation mode
+        self.distances = None
+
+        # The precision used for the last view
+        self.precision = "double"
+
+
+    def choosePrecision(self, noPixels, plotRange, juliaC=None, kernel=None,
+                        distance=False):
+        """
+        Choose the precision of the calculation for a view. Double precision is
+        used unless the pixels are too small to be resolved in double
+        precision, then the deep zoom precision is used. The deep zoom
+        precision is only available for the Mandelbrot set in iteration count
+        mode.
+
+        The deep zoom precision resolves the pixels relative to the view
+        center, but the center itself comes from the double precision corner
+        of the plot range. Views are therefore placed on the grid of double
+        precision numbers, about 1e-16 times the coordinates. When the pixels
+        get that small, a few decades below deepLimit, the views that can be
+        chosen are pixels apart, and a few decades further the view can not be
+        moved at all. So the deep zoom precision extends the zoom by only a
+        few decades.
+
+        Arguments:
+        noPixels     -- Image size, pixels x pixels (int)
+        plotRange    -- The range in the complex plane to plot.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The precision, "double" or "deep" (string).
+        """
+
+        # Pixel size relative to the coordinates
+        cDelta = plotRange.zSize/float(noPixels)
+        scale = max(1.,abs(plotRange.corner) + plotRange.zSize)
+        if (cDelta >= self.deepLimit*scale):
+            return "double"
+
+        if ((juliaC is not None) or distance or
+            ((kernel is not None) and (kernel.name != mandelbrotKernel.name))):
+            print("Warning: No deep zoom precision for this view, using double precision!")
+            return "double"
+
+        return "deep"
+
+
+    def resolveMode(self, kernel=None, distance=False):
+        """
+        Resolve the kernel and mode of a view. The default kernel is the
+        Mandelbrot kernel and distance estimation is turned off for kernels
+        without a derivative.
+
+        Arguments:
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The kernel and distance estimation mode to use (tuple).
+        """
+
+        if kernel is None:
+            kernel = mandelbrotKernel
+
+        return kernel, distance and (kernel.derivative is not None)
+
+
+    def viewSettings(self, noPixels, plotRange, juliaC=None, kernel=None,
+                     distance=False):
+        """
+        Resolve the calculation settings of a view. The default kernel is the
+        Mandelbrot kernel, distance estimation needs the derivative of the
+        kernel and the precision is chosen by choosePrecision.
+
+        Arguments:
+        noPixels     -- Image size, pixels x pixels (int)
+        plotRange    -- The range in the complex plane to plot.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The kernel, distance estimation mode and precision to use (tuple).
+        """
+
+        # Distance estimation needs the derivative of the kernel
+        kernel, resolved = self.resolveMode(kernel,distance)
+        if distance and not resolved:
+            print("Warning: No distance estimation for the %s kernel!" % kernel.name)
+        distance = resolved
+
+        precision = self.choosePrecision(noPixels,plotRange,juliaC,kernel,distance)
+
+        return kernel, distance, precision
+
+
+    def generate(self, noPixels, colorMap, plotRange, depth, juliaC=None, kernel=None,
+                 distance=False):
+        """
+        This function fills the image with the range plotRange of the Mandelbrot
+        set. The depth of the colors, i.e. the number of colors used for
+        representation, is the same as the imaximum number of Mandelbrot iterations.
+
+        In distance estimation mode the image shows the estimated distance to
+        the border of the set instead, which keeps thin filaments visible at
+        low depths. The distances are available in the distances attribute.
+
+        The precision of the calculation is chosen by choosePrecision and
+        recorded in the precision attribute, see viewSettings.
+
+        Arguments:
+        noPixels     -- Image size, pixels x pixels (int)
+        colorMap     -- The color map used for the image.
+        plotRange    -- The range in the complex plane to plot.
+        depth        -- The maximum number of Mandelbrot iterations.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The generated image.
+        """
+
+        # Resolve the settings
+        kernel, distance, precision = self.viewSettings(noPixels,plotRange,
+                juliaC,kernel,distance)
+
+        # Fill image
+        self.image, self.iterations, self.distances = self.fillImage(plotRange,
+                noPixels,depth,colorMap,None,juliaC,kernel,distance,precision)
+
+        # Remember the view, the last view is kept if the render is cancelled
+        self.precision = precision
+        self.plotRange = plotRange
+        self.noPixels = noPixels
+        self.depth = depth
+        self.juliaC = juliaC
+        self.kernel = kernel
+
+        return self.image
+
+
+    def isInside(self, plotRange, depth, juliaC=None, kernel=None, distance=False):
+        """
+        Check if a new view lies inside the last generated image and has the
+        same depth, Julia set constant, kernel and mode, so that the last image
+        can be reused for it.
+
+        Arguments:
+        plotRange    -- The range in the complex plane of the new view.
+        depth        -- The maximum number of Mandelbrot iterations.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        True if the last image can be reused (bool).
+        """
+
+        # Compare with the settings actually used for the last image
+        kernel, distance = self.resolveMode(kernel,distance)
+
+        if ((self.iterations is None) or (depth != self.depth) or
+            (juliaC != self.juliaC) or (kernel.name != self.kernel.name) or
+            (distance != (self.distances is not None))):
+            return False
+
+        # Check that the new view is inside the last one
+        corner = self.plotRange.corner
+        zSize = self.plotRange.zSize
+        if ((plotRange.corner.real < corner.real) or
+            (plotRange.corner.imag > corner.imag) or
+            (plotRange.corner.real + plotRange.zSize > corner.real + zSize) or
+            (plotRange.corner.imag - plotRange.zSize < corner.imag - zSize)):
+            return False
+
+        return True
+
+
+    def getParentData(self, noPixels, plotRange, depth, juliaC=None, kernel=None,
+                      distance=False):
+        """
+        Get the iteration numbers of the last generated image resampled to a
+        new view. This is only possible if the new view lies inside the last
+        one and has the same depth, Julia set constant, kernel and mode.
+
+        Arguments:
+        noPixels     -- Image size of the new view, pixels x pixels (int)
+        plotRange    -- The range in the complex plane of the new view.
+        depth        -- The maximum number of Mandelbrot iterations.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The resampled iteration buffer (list of lists) or None.
+        """
+
+        if not self.isInside(plotRange,depth,juliaC,kernel,distance):
+            return None
+
+        return self.resampleIterations(self.iterations,self.plotRange,self.noPixels,
+                plotRange,noPixels)
+
+
+    def preview(self, noPixels, colorMap, plotRange, depth, juliaC=None, kernel=None,
+                distance=False):
+        """
+        This function creates a preview of a view inside the last generated
+        image by upscaling the part of the last image covering the view. No
+        Mandelbrot iterations are calculated.
+
+        Arguments:
+        noPixels     -- Image size, pixels x pixels (int)
+        colorMap     -- The color map, unused since the colors of the last
+                        image are reused.
+        plotRange    -- The range in the complex plane to plot.
+        depth        -- The maximum number of Mandelbrot iterations.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The preview image or None if the last image can not be used.
+        """
+
+        if not self.isInside(plotRange,depth,juliaC,kernel,distance):
+            return None
+
+        # The pixels of the last image covering the view, at least one pixel
+        cDelta = self.plotRange.zSize/float(self.noPixels)
+        i0 = int((plotRange.corner.real - self.plotRange.corner.real)/cDelta)
+        j0 = int((self.plotRange.corner.imag - plotRange.corner.imag)/cDelta)
+        size = max(1,int(round(plotRange.zSize/cDelta)))
+        i0 = min(i0,self.noPixels - size)
+        j0 = min(j0,self.noPixels - size)
+
+        # Crop and upscale the last image, Qt does the scaling in C++
+        return self.image.copy(i0,j0,size,size).scaled(noPixels,noPixels)
+
+
+    def zoom(self, noPixels, colorMap, plotRange, depth, juliaC=None, kernel=None,
+             distance=False):
+        """
+        This function does the same thing as generate but uses the last
+        generated image to guide the calculation when the new view lies inside
+        the last one. Uniform regions of the last image are then filled by
+        subdivision instead of being iterated pixel by pixel.
+
+        Arguments:
+        noPixels     -- Image size, pixels x pixels (int)
+        colorMap     -- The color map used for the image.
+        plotRange    -- The range in the complex plane to plot.
+        depth        -- The maximum number of Mandelbrot iterations.
+        juliaC       -- The constant of the Julia set to plot, or None for the
+                        Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        distance     -- Use distance estimation mode (bool).
+
+        Return:
+        The generated image.
+        """
+
+        guide = self.getParentData(noPixels,plotRange,depth,juliaC,kernel,distance)
+        if guide is None:
+            return self.generate(noPixels,colorMap,plotRange,depth,juliaC,kernel,
+                    distance)
+
+        # Resolve the settings
+        kernel, distance, precision = self.viewSettings(noPixels,plotRange,
+                juliaC,kernel,distance)
+
+        # Fill image
+        self.image, self.iterations, self.distances = self.fillImage(plotRange,
+                noPixels,depth,colorMap,guide,juliaC,kernel,distance,precision)
+
+        # Remember the view, the last view is kept if the render is cancelled
+        self.precision = precision
+        self.plotRange = plotRange
+        self.noPixels = noPixels
+        self.depth = depth
+
+        return self.image
+
+
+    def pan(self, dx, dy, colorMap):
+        """
+        This function moves the last generated image by (dx,dy) pixels. Only
+        the pixels exposed by the move are calculated, the rest of the image is
+        reused.
+
+        The image size, depth, Julia set constant, kernel, mode and color map are
+        the same as for the last generated image.
+
+        Arguments:
+        dx           -- Pixels to move the image content to the right (int).
+        dy           -- Pixels to move the image content downwards (int).
+        colorMap     -- The color map used for the image.
+
+        Return:
+        The generated image.
+        """
+
+        if self.iterations is None:
+            print("Error: There is no image to pan!")
+            return None
+
+        # Calculate the new plot range
+        noPixels = self.noPixels
+        cDelta = self.plotRange.zSize/float(noPixels)
+        corner = self.plotRange.corner - complex(dx*cDelta,-dy*cDelta)
+        plotRange = PlotRange(corner,self.plotRange.zSize)
+
+        # Nothing can be reused if the image is moved out of sight
+        if (abs(dx) >= noPixels) or (abs(dy) >= noPixels):
+            return self.generate(noPixels,colorMap,plotRange,self.depth,self.juliaC,
+                    self.kernel,self.distances is not None)
+
+        # Shift image
+        self.image, self.iterations, self.distances = self.shiftImage(plotRange,
+                noPixels,self.depth,colorMap,self.image,self.iterations,dx,dy,
+                self.juliaC,self.kernel,self.distances,self.precision)
+        self.plotRange = plotRange
+
+        return self.image
+
+
+    def recolor(self, colorMap):
+        """
+        This function paints the last generated image again with another
+        color map. Nothing is calculated, so changing the colors is fast.
+
+        Arguments:
+        colorMap     -- The color map with depth colors.
+
+        Return:
+        The repainted image.
+        """
+
+        if self.iterations is None:
+            print("Error: There is no image to recolor!")
+            return None
+
+        image = QtGui.QImage(self.noPixels,self.noPixels,QtGui.QImage.Format_RGB32)
+        allPixels = range(self.noPixels)
+        self.paintImage(image,self.iterations,colorMap,allPixels,allPixels)
+        self.image = image
+
+        return self.image
+
+
+# === Main ===================================================================
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser(description="Generate an image of the Mandelbrot set")
+    parser.add_argument("--pixels",type=int,default=500)
+    parser.add_argument("--depth",type=int,default=200)
+    parser.add_argument("--intensity",type=int,default=200)
+    parser.add_argument("--kernel",default=mandelbrotKernel.name,choices=kernelNames)
+    parser.add_argument("--corner",type=float,nargs=2,default=[-2.,2.])
+    parser.add_argument("--size",type=float,default=4.)
+    parser.add_argument("--distance",action="store_true")
+    parser.add_argument("--scheme",default="Classic",help="The color scheme")
+    parser.add_argument("--gradients",default=None,
+            help="A JSON file with gradients to use as color schemes")
+    parser.add_argument("--output",default="slask.bmp")
+    parser.add_argument("--profile",nargs="?",const="-",default=None,
+            help="Profile the render, and save the statistics to the file given")
+    args = parser.parse_args()
+
+    print("Generating an image of the mandelbrot set")
+
+    # Create a color map
+    if args.gradients is not None:
+        loadGradients(args.gradients)
+    colorMap = ColorMap()
+    colorMap.generate(args.depth,args.intensity,args.scheme)
+
+    # Create a image of the mandelbrot set
+    plotRange = PlotRange(complex(*args.corner),args.size)
+    mandelbrot = MandelbrotImage()
+    renderArgs = (args.pixels,colorMap,plotRange,args.depth,None,
+                  getKernel(args.kernel),args.distance)
+    if args.profile is None:
+        image = mandelbrot.generate(*renderArgs)
+    else:
+        fileName = None
+        if (args.profile != "-"):
+            fileName = args.profile
+        image = profileCall(mandelbrot.generate,renderArgs,fileName)
+
+    image.save(args.output)
+
+    print(mandelbrot.stats)
     print("Done! The picture is saved to a file.")
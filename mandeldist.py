@@ -0,0 +1,803 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+This module renders large Mandelbrot images on several machines. A
+coordinator splits a render job into tiles and hands them to tile workers over
+a socket. The tiles are stitched together into the iteration buffer of the
+whole image.
+
+The jobs are the render jobs of the mandelserver module. The protocol is one
+JSON object per line. The coordinator sends,
+
+  {"job": <job>, "tile": [i0, i1, j0, j1]}
+
+and the worker answers with the iteration buffer of the tile,
+
+  {"tile": [i0, i1, j0, j1], "iterations": [[...], ...], "distances": null}
+
+or with {"error": <message>}. The tiles are small and handed out one at a time
+from a shared queue, so fast workers take more tiles and all workers stay busy
+until the end. Optionally the cost of the tiles is estimated by a coarse render
+first and the most expensive tiles are handed out first.
+
+Tiles that fail, or take longer than the time out, are handed to another
+worker. A tile still running after the slow time is also handed to an idle
+worker and the first result is used.
+
+Example:
+python mandeldist.py worker --port 8900          (on each machine)
+python mandeldist.py render --workers host1:8900,host2:8900 --output big.ppm
+python mandeldist.py render --local 4 --estimate --job '{"noPixels": 2000}'
+"""
+
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from collections import deque
+from multiprocessing import Process, Pipe
+
+try:
+    from SocketServer import TCPServer, ThreadingMixIn, StreamRequestHandler
+except ImportError:
+    from socketserver import TCPServer, ThreadingMixIn, StreamRequestHandler
+
+import mandelbrot as MB
+from mandelserver import normalizeJob, jobView, toPPM
+
+# -------------------------------------------------------------------
+def renderTile(job, tile):
+    """
+    Render a tile of a job.
+
+    Arguments:
+    job          -- The job (dict).
+    tile         -- The tile [i0,i1,j0,j1] (list of int).
+
+    Return:
+    The reply to the coordinator (dict).
+    """
+
+    start = time.time()
+    job = normalizeJob(job)
+    i0, i1, j0, j1 = [int(k) for k in tile]
+    if not ((0 <= i0 < i1 <= job["noPixels"]) and (0 <= j0 < j1 <= job["noPixels"])):
+        raise ValueError("Tile outside of the image: %s" % tile)
+
+    # The precision is chosen for the whole view, so all tiles get the same
+    plotRange, juliaC, kernel, distance, precision = jobView(job)
+    iterations, distances = MB.MandelbrotImage().calcTile(plotRange,job["noPixels"],
+            job["depth"],i0,i1,j0,j1,juliaC,kernel,distance,precision)
+
+    return {"tile": [i0,i1,j0,j1],
+            "iterations": iterations,
+            "distances": distances,
+            "time": time.time()-start}
+
+def splitTiles(noPixels, tileSize):
+    """
+    Split an image into tiles.
+
+    Arguments:
+    noPixels     -- The number of pixels per image side (int).
+    tileSize     -- The side length of the tiles (int).
+
+    Return:
+    The tiles [i0,i1,j0,j1] row by row (list of lists).
+    """
+
+    tiles = []
+    for j0 in range(0,noPixels,tileSize):
+        for i0 in range(0,noPixels,tileSize):
+            tiles.append([i0,min(i0+tileSize,noPixels),j0,min(j0+tileSize,noPixels)])
+
+    return tiles
+
+def estimateTileCosts(job, tileSize, samples=4):
+    """
+    Estimate the cost of the tiles of a job by a coarse render of the whole
+    view with samples x samples pixels per tile. The cost of a tile is the sum
+    of the iterations of the coarse pixels in the tile, since the time of a
+    pixel grows with its number of iterations.
+
+    Arguments:
+    job          -- The normalized job (dict).
+    tileSize     -- The side length of the tiles (int).
+    samples      -- The number of coarse pixels per tile side (int).
+
+    Return:
+    The estimated costs in the order of splitTiles (list of int).
+    """
+
+    noPixels = job["noPixels"]
+    noTiles = (noPixels + tileSize - 1)//tileSize
+    coarsePixels = noTiles*samples
+
+    # Setup the coarse view, the iterations are estimated also in distance
+    # estimation mode
+    plotRange, juliaC, kernel, distance, precision = jobView(job,coarsePixels,False)
+    iterations, distances = MB.MandelbrotImage().calcView(plotRange,coarsePixels,
+            job["depth"],None,juliaC,kernel,False,precision)
+
+    # Add the coarse pixels to the tile of their center
+    costs = [0]*(noTiles*noTiles)
+    scale = noPixels/float(coarsePixels)
+    for ci in range(coarsePixels):
+        ti = int((ci+0.5)*scale)//tileSize
+        for cj in range(coarsePixels):
+            tj = int((cj+0.5)*scale)//tileSize
+            costs[tj*noTiles + ti] += iterations[ci][cj]
+
+    return costs
+
+# -------------------------------------------------------------------
+class TileRequestHandler(StreamRequestHandler):
+    """
+    This class handles a connection from a coordinator. Tiles are rendered
+    one at a time until the coordinator closes the connection.
+    """
+
+    def handle(self):
+        """
+        Answer the tile requests of the connection.
+        """
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+
+            try:
+                request = json.loads(line.decode("utf-8"))
+                reply = renderTile(request["job"],request["tile"])
+            except Exception as error:
+                reply = {"error": "%s: %s" % (type(error).__name__,error)}
+
+            try:
+                self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except socket.error:
+                # The coordinator gave up on the tile
+                break
+
+# -------------------------------------------------------------------
+class TileWorkerServer(ThreadingMixIn, TCPServer):
+    """
+    This class is the tile worker, handling each connection in a thread.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        """
+        Constructor.
+
+        Arguments:
+        address      -- The (host,port) to listen on, port 0 for any free port
+                        (tuple).
+        """
+
+        TCPServer.__init__(self,address,TileRequestHandler)
+
+def serveWorker(host, port, connection=None):
+    """
+    Run a tile worker until it is killed.
+
+    Arguments:
+    host         -- The host to listen on (string).
+    port         -- The port to listen on, 0 for any free port (int).
+    connection   -- A pipe connection to send the address of the worker to,
+                    or None.
+    """
+
+    server = TileWorkerServer((host,port))
+    if connection is not None:
+        connection.send(server.server_address)
+        connection.close()
+
+    server.serve_forever()
+
+def startLocalWorkers(noWorkers, host="localhost"):
+    """
+    Start tile workers as processes on this machine.
+
+    Arguments:
+    noWorkers    -- The number of workers (int).
+    host         -- The host to listen on (string).
+
+    Return:
+    The worker processes and their addresses (tuple of lists).
+    """
+
+    processes = []
+    addresses = []
+    for k in range(noWorkers):
+        parentConnection, childConnection = Pipe()
+        process = Process(target=serveWorker,args=(host,0,childConnection))
+        process.daemon = True
+        process.start()
+
+        processes.append(process)
+        addresses.append(tuple(parentConnection.recv()))
+
+    return processes, addresses
+
+def stopLocalWorkers(processes):
+    """
+    Stop the tile workers started by startLocalWorkers.
+
+    Arguments:
+    processes    -- The worker processes (list of Process).
+    """
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+# -------------------------------------------------------------------
+class TileConnection(object):
+    """
+    This class is the connection from the coordinator to a tile worker.
+    """
+
+    def __init__(self, address, timeout):
+        """
+        Constructor.
+
+        Arguments:
+        address      -- The (host,port) of the worker (tuple).
+        timeout      -- The time out of the connection and the replies in
+                        seconds (float).
+        """
+
+        self.socket = socket.create_connection(address,timeout)
+        self.reader = self.socket.makefile("rb")
+
+    def request(self, message):
+        """
+        Send a request and wait for the reply.
+
+        Arguments:
+        message      -- The request (dict).
+
+        Return:
+        The reply (dict). A socket.error is raised for a failed or timed out
+        connection and a ValueError for a bad reply.
+        """
+
+        self.socket.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        line = self.reader.readline()
+        if not line:
+            raise socket.error("Connection closed by the worker")
+
+        return json.loads(line.decode("utf-8"))
+
+    def close(self):
+        """
+        Close the connection.
+        """
+
+        self.reader.close()
+        self.socket.close()
+
+# -------------------------------------------------------------------
+class TileQueue(object):
+    """
+    This class keeps track of the tiles of a job and of the workers rendering
+    them. Tiles are handed out in order, failed tiles are put back and tiles
+    running longer than the slow time are handed out once more to idle
+    workers.
+
+    A tile is not handed to a worker it has failed on. The job fails when a
+    tile has failed on all workers left, or when no workers are left.
+    """
+
+    def __init__(self, tiles, slowTime, order=None):
+        """
+        Constructor.
+
+        Arguments:
+        tiles        -- The tiles of the job (list of lists).
+        slowTime     -- The time in seconds after which a running tile is
+                        handed out again (float).
+        order        -- The tile indices in the order to hand them out, None
+                        for the order of the tiles (list of int).
+        """
+
+        self.tiles = tiles
+        self.slowTime = slowTime
+
+        # Indices of the tiles waiting and done, and the start time of the
+        # running tiles per worker
+        if order is None:
+            order = range(len(tiles))
+        self.waiting = deque(order)
+        self.running = {}
+        self.done = set()
+
+        # The workers each tile has failed on and the last failure
+        self.failedBy = [set() for tile in tiles]
+        self.messages = [None]*len(tiles)
+
+        # The workers still handing out tiles
+        self.workers = set()
+
+        self.error = None
+        self.condition = threading.Condition()
+
+    def finished(self):
+        """
+        Check if the job is finished, with or without error.
+
+        Return:
+        True if finished (bool).
+        """
+
+        return (self.error is not None) or (len(self.done) == len(self.tiles))
+
+    def addWorker(self, worker):
+        """
+        Add a worker handing out tiles.
+
+        Arguments:
+        worker       -- The (host,port) of the worker (tuple).
+        """
+
+        with self.condition:
+            self.workers.add(worker)
+
+    def dropWorker(self, worker):
+        """
+        Remove a worker that stopped handing out tiles. The job fails if no
+        workers are left, or if the tiles waiting have failed on all workers
+        left.
+
+        Arguments:
+        worker       -- The (host,port) of the worker (tuple).
+        """
+
+        with self.condition:
+            self.workers.discard(worker)
+            if self.finished():
+                return
+
+            if not self.workers:
+                self.abort("No tile workers left")
+            else:
+                for index in self.waiting:
+                    self.checkTile(index)
+
+            self.condition.notify_all()
+
+    def checkTile(self, index):
+        """
+        Fail the job if a tile has failed on all workers left. Call with the
+        condition held.
+
+        Arguments:
+        index        -- The tile index (int).
+        """
+
+        if self.workers <= self.failedBy[index]:
+            self.abort("Tile %s failed: %s" % (self.tiles[index],self.messages[index]))
+
+    def next(self, worker):
+        """
+        Get the next tile for a worker to render, waiting for one if needed.
+
+        Arguments:
+        worker       -- The (host,port) of the worker (tuple).
+
+        Return:
+        The tile index, or None if the job is finished (int).
+        """
+
+        with self.condition:
+            while not self.finished():
+                for index in self.waiting:
+                    if worker not in self.failedBy[index]:
+                        self.waiting.remove(index)
+                        self.running[index] = {worker: time.time()}
+                        return index
+
+                # Hand out a slow tile once more
+                now = time.time()
+                for index, starts in self.running.items():
+                    if ((worker not in starts) and (worker not in self.failedBy[index]) and
+                        (now - max(starts.values()) > self.slowTime)):
+                        starts[worker] = now
+                        return index
+
+                self.condition.wait(0.1)
+
+            return None
+
+    def complete(self, index):
+        """
+        Mark a tile as done.
+
+        Arguments:
+        index        -- The tile index (int).
+
+        Return:
+        True if this is the first result of the tile (bool).
+        """
+
+        with self.condition:
+            if index in self.done:
+                return False
+
+            self.done.add(index)
+            self.running.pop(index,None)
+            self.condition.notify_all()
+
+            return True
+
+    def fail(self, index, worker, message, tileError=True):
+        """
+        Put back a failed tile. The tile stays with the other workers if it
+        was handed out once more and is still running.
+
+        Arguments:
+        index        -- The tile index (int).
+        worker       -- The (host,port) of the worker (tuple).
+        message      -- The reason of the failure (string).
+        tileError    -- The tile failed, and is not handed to the worker again.
+                        False if the worker failed, e.g. the connection was
+                        lost (bool).
+        """
+
+        with self.condition:
+            if index in self.done:
+                return
+
+            starts = self.running.get(index,{})
+            starts.pop(worker,None)
+            if tileError:
+                self.failedBy[index].add(worker)
+                self.messages[index] = message
+
+            if not starts:
+                # Try again soon, the tile was handed out early for a reason
+                self.running.pop(index,None)
+                self.waiting.appendleft(index)
+                self.checkTile(index)
+
+            self.condition.notify_all()
+
+    def abort(self, message):
+        """
+        Fail the job.
+
+        Arguments:
+        message      -- The reason of the failure (string).
+        """
+
+        with self.condition:
+            if self.error is None:
+                self.error = message
+            self.condition.notify_all()
+
+# -------------------------------------------------------------------
+class TileCoordinator(object):
+    """
+    This class renders jobs by handing out their tiles to tile workers and
+    stitching the results together.
+    """
+
+    def __init__(self, addresses, tileSize=32, timeout=60., slowTime=20.,
+                 retries=3, estimate=False):
+        """
+        Constructor.
+
+        Arguments:
+        addresses    -- The (host,port) of the workers (list of tuples).
+        tileSize     -- The side length of the tiles, a multiple of 16 gives
+                        the same distance estimation as a single render (int).
+        timeout      -- The time in seconds to wait for a tile (float).
+        slowTime     -- The time in seconds after which a tile is also handed
+                        to an idle worker (float).
+        retries      -- The number of times in a row a worker may fail before it
+                        is dropped (int).
+        estimate     -- Estimate the tile costs by a coarse render and hand out
+                        the most expensive tiles first (bool).
+        """
+
+        self.addresses = list(addresses)
+        self.tileSize = tileSize
+        self.timeout = timeout
+        self.slowTime = slowTime
+        self.retries = retries
+        self.estimate = estimate
+
+        # The statistics of the workers in the last job, see utilization
+        self.workerStats = []
+        self.renderTime = 0.
+        self.renderEnd = 0.
+
+    def render(self, job):
+        """
+        Render a job.
+
+        Arguments:
+        job          -- The job (dict).
+
+        Return:
+        The iteration buffer and the distance buffer, None if not in distance
+        estimation mode (tuple). A ValueError is raised for an invalid job and
+        a RuntimeError if the job failed.
+        """
+
+        job = normalizeJob(job)
+        noPixels = job["noPixels"]
+
+        # The stitched buffers
+        iterations = [[0]*noPixels for i in range(noPixels)]
+        distances = None
+        if job["distance"]:
+            distances = [[0.]*noPixels for i in range(noPixels)]
+
+        # Most expensive tiles first
+        order = None
+        if self.estimate:
+            costs = estimateTileCosts(job,self.tileSize)
+            order = sorted(range(len(costs)),key=lambda k: -costs[k])
+
+        # Render the tiles with one thread per worker
+        tiles = TileQueue(splitTiles(noPixels,self.tileSize),self.slowTime,order)
+        for address in self.addresses:
+            tiles.addWorker(address)
+        start = time.time()
+        self.workerStats = []
+        threads = []
+        for address in self.addresses:
+            stats = {"address": address, "tiles": 0, "failures": 0,
+                     "busy": 0., "compute": 0., "end": start}
+            self.workerStats.append(stats)
+            thread = threading.Thread(target=self.workerLoop,
+                    args=(address,job,tiles,iterations,distances,stats))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+        self.renderEnd = time.time()
+        self.renderTime = self.renderEnd - start
+
+        if tiles.error is not None:
+            raise RuntimeError(tiles.error)
+
+        return iterations, distances
+
+    def workerLoop(self, address, job, tiles, iterations, distances, stats):
+        """
+        Hand out tiles to a worker until the job is finished. The worker is
+        dropped after too many failures in a row.
+
+        Lost connections are failures of the worker. Error replies and time
+        outs are failures of the tile, which then is handed to another worker.
+
+        Arguments:
+        address      -- The (host,port) of the worker (tuple).
+        job          -- The normalized job (dict).
+        tiles        -- The tiles of the job (TileQueue).
+        iterations   -- The iteration buffer to stitch into (list of lists).
+        distances    -- The distance buffer to stitch into, or None (list of
+                        lists).
+        stats        -- The statistics of the worker to update (dict).
+        """
+
+        connection = None
+        noFailures = 0
+        while True:
+            index = tiles.next(address)
+            if index is None:
+                break
+
+            tile = tiles.tiles[index]
+            start = time.time()
+            try:
+                if connection is None:
+                    connection = TileConnection(address,self.timeout)
+                reply = connection.request({"job": job, "tile": tile})
+                if "error" in reply:
+                    raise ValueError(reply["error"])
+
+                noFailures = 0
+                stats["tiles"] += 1
+                stats["compute"] += reply.get("time",0.)
+                if tiles.complete(index):
+                    self.stitch(tile,reply,iterations,distances)
+
+            except (socket.error, ValueError, KeyError) as error:
+                # Start over with a new connection
+                if connection is not None:
+                    connection.close()
+                    connection = None
+
+                tileError = (isinstance(error,socket.timeout) or
+                             not isinstance(error,socket.error))
+                tiles.fail(index,address,"%s:%d: %s" % (address + (error,)),tileError)
+                stats["failures"] += 1
+                noFailures += 1
+                if (noFailures > self.retries):
+                    print("Warning: Dropping tile worker %s:%d!" % address)
+                    break
+
+            finally:
+                stats["busy"] += time.time() - start
+                stats["end"] = time.time()
+
+        if connection is not None:
+            connection.close()
+
+        # Fail the job when all workers are dropped
+        tiles.dropWorker(address)
+
+    def stitch(self, tile, reply, iterations, distances):
+        """
+        Copy the buffers of a rendered tile into the buffers of the image.
+
+        Arguments:
+        tile         -- The tile [i0,i1,j0,j1] (list of int).
+        reply        -- The reply of the worker (dict).
+        iterations   -- The iteration buffer of the image (list of lists).
+        distances    -- The distance buffer of the image, or None (list of
+                        lists).
+        """
+
+        i0, i1, j0, j1 = tile
+        for k, column in enumerate(reply["iterations"]):
+            iterations[i0+k][j0:j1] = column
+
+        if distances is not None:
+            for k, column in enumerate(reply["distances"]):
+                distances[i0+k][j0:j1] = column
+
+    def utilization(self):
+        """
+        Get the utilization of the workers in the last job, not counting the
+        cost estimation. The busy time is the time a worker had a tile,
+        including the transfer, and the compute time is the time the worker
+        spent rendering. The idle time at the end is the time from the last
+        tile of the worker to the end of the job, which is short for all
+        workers when the load is balanced.
+
+        Return:
+        The statistics per worker (list of dicts) with the keys address,
+        tiles, failures, busy, compute, utilization and idleAtEnd.
+        """
+
+        report = []
+        for stats in self.workerStats:
+            utilization = 0.
+            if (self.renderTime > 0.):
+                utilization = stats["busy"]/self.renderTime
+            report.append({"address": stats["address"],
+                           "tiles": stats["tiles"],
+                           "failures": stats["failures"],
+                           "busy": stats["busy"],
+                           "compute": stats["compute"],
+                           "utilization": utilization,
+                           "idleAtEnd": self.renderEnd - stats["end"]})
+
+        return report
+
+# -------------------------------------------------------------------
+def saveJob(fileName, job, iterations, distances, tileSize=64):
+    """
+    Save the iteration buffer of a rendered job to an iteration file, see the
+    mandelfile module.
+
+    Arguments:
+    fileName     -- The file name (string).
+    job          -- The normalized job (dict).
+    iterations   -- The iteration buffer (list of lists).
+    distances    -- The distance buffer, or None (list of lists).
+    tileSize     -- The side length of the tiles in the file (int).
+    """
+
+    from mandelfile import IterationWriter
+
+    plotRange, juliaC, kernel, distance, precision = jobView(job)
+
+    floatPlane = None
+    if distances is not None:
+        floatPlane = "distance"
+
+    with IterationWriter(fileName,plotRange,job["noPixels"],job["depth"],kernel,
+            precision,juliaC,distance,tileSize,floatPlane) as writer:
+        writer.writeBuffer(iterations,distances)
+
+def parseAddress(text):
+    """
+    Parse a host:port address.
+
+    Arguments:
+    text         -- The address (string).
+
+    Return:
+    The (host,port) tuple.
+    """
+
+    host, port = text.rsplit(":",1)
+    return (host,int(port))
+
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser(description="Distributed Mandelbrot rendering")
+    commands = parser.add_subparsers(dest="command")
+
+    workerParser = commands.add_parser("worker",help="Run a tile worker")
+    workerParser.add_argument("--host",default="localhost")
+    workerParser.add_argument("--port",type=int,default=8900)
+
+    renderParser = commands.add_parser("render",help="Render a job on the workers")
+    renderParser.add_argument("--workers",default="",
+            help="Comma separated host:port of the workers")
+    renderParser.add_argument("--local",type=int,default=0,
+            help="Number of local worker processes to start")
+    renderParser.add_argument("--job",default="{}",help="The job as JSON")
+    renderParser.add_argument("--tile-size",type=int,default=32)
+    renderParser.add_argument("--estimate",action="store_true",
+            help="Hand out the most expensive tiles first")
+    renderParser.add_argument("--timeout",type=float,default=60.)
+    renderParser.add_argument("--output",default="mandelbrot.ppm")
+    renderParser.add_argument("--save",default=None,
+            help="Also save the iterations to an iteration file")
+    args = parser.parse_args()
+
+    if (args.command == "worker"):
+        print("Tile worker listening on %s:%d" % (args.host,args.port))
+        try:
+            serveWorker(args.host,args.port)
+        except KeyboardInterrupt:
+            None
+
+    elif (args.command == "render"):
+        # Collect the workers
+        processes = []
+        addresses = [parseAddress(text) for text in args.workers.split(",") if text]
+        if (args.local > 0):
+            processes, localAddresses = startLocalWorkers(args.local)
+            addresses += localAddresses
+        if not addresses:
+            print("Error: No tile workers given!")
+            sys.exit(1)
+
+        # Render and save the image
+        try:
+            job = normalizeJob(json.loads(args.job))
+            coordinator = TileCoordinator(addresses,args.tile_size,args.timeout,
+                    args.timeout/3.,estimate=args.estimate)
+            start = time.time()
+            iterations, distances = coordinator.render(job)
+            print("Rendered in %.2f s" % (time.time()-start))
+
+            # Report the load balance
+            for stats in coordinator.utilization():
+                print("%s:%d  %4d tiles  busy %5.1f%%  compute %.2f s  idle at end %.2f s" %
+                      (stats["address"] + (stats["tiles"],100.*stats["utilization"],
+                       stats["compute"],stats["idleAtEnd"])))
+
+            colorMap = MB.ColorMap()
+            colorMap.generate(job["depth"],job["intensity"],job["scheme"])
+            with open(args.output,"wb") as f:
+                f.write(toPPM(iterations,colorMap))
+
+            if args.save is not None:
+                saveJob(args.save,job,iterations,distances,args.tile_size)
+        except (ValueError, RuntimeError) as error:
+            print("Error: %s" % error)
+            sys.exit(1)
+        finally:
+            stopLocalWorkers(processes)
+
+    else:
+        parser.print_help()
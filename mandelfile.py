@@ -0,0 +1,617 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+This module saves and loads Mandelbrot iteration buffers, so a render can be
+archived and colored again later without calculating it again.
+
+The iteration file is split into tiles. Each tile is a chunk holding the
+iteration numbers of the tile, and optionally a plane of floats per pixel
+(e.g. the distances in distance estimation mode), column by column as in the
+iteration buffer. The chunks are compressed one by one and an index at the end
+of the file gives random access to the tiles.
+
+File layout, all numbers little endian:
+  "MITR", version (uint16), header size (uint32), header (JSON), padding
+  "TILE", i0, i1, j0, j1, chunk size (uint32), chunk, padding    (per tile)
+  "INDX", i0, i1, j0, j1 (uint32), chunk offset (uint64)          (per tile)
+  index offset (uint64), number of tiles (uint32), "MEND"
+
+The header holds the plot range, image size, depth, kernel, precision, Julia
+constant, distance mode, tile size, the type of the iteration numbers ("uint16"
+or "uint32"), the name of the float plane (or null) and the compression
+("zlib" or "none"). Padding aligns each part to 8 bytes. The chunks of an
+uncompressed file can be read without copying through mmap, see
+IterationReader.tileView.
+
+Example:
+python mandelfile.py color render.mitr render.ppm --intensity 150
+"""
+
+import sys
+import json
+import zlib
+import mmap
+import struct
+import argparse
+from array import array
+
+import mandelbrot as MB
+
+# File format constants
+fileMagic = b"MITR"
+fileVersion = 1
+tileMagic = b"TILE"
+indexMagic = b"INDX"
+endMagic = b"MEND"
+
+startStruct = struct.Struct("<4sHI")
+tileStruct = struct.Struct("<4sIIIII")
+indexStruct = struct.Struct("<4sIIIIQ")
+endStruct = struct.Struct("<QI4s")
+
+# The buffer type of Python 2, for memory mapped tiles
+try:
+    buffer
+except NameError:
+    buffer = None
+
+# Array type codes of the planes
+countTypes = {"uint16": "H", "uint32": "I"}
+floatType = "f"
+
+# -------------------------------------------------------------------
+def padding(size):
+    """
+    The number of bytes needed to align a size to 8 bytes.
+
+    Arguments:
+    size         -- The size in bytes (int).
+
+    Return:
+    The number of padding bytes (int).
+    """
+
+    return -size % 8
+
+def arrayToBytes(values):
+    """
+    Convert an array to little endian bytes.
+
+    Arguments:
+    values       -- The values (array).
+
+    Return:
+    The bytes (bytes).
+    """
+
+    if (sys.byteorder != "little"):
+        values = array(values.typecode,values)
+        values.byteswap()
+
+    if hasattr(values,"tobytes"):
+        return values.tobytes()
+    return values.tostring()
+
+def bytesToArray(typeCode, data):
+    """
+    Convert little endian bytes to an array.
+
+    Arguments:
+    typeCode     -- The type code of the array (string).
+    data         -- The bytes (bytes).
+
+    Return:
+    The values (array).
+    """
+
+    values = array(typeCode)
+    if hasattr(values,"frombytes"):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+
+    if (sys.byteorder != "little"):
+        values.byteswap()
+
+    return values
+
+def toColumns(values, width, height):
+    """
+    Split a plane of a tile into columns.
+
+    Arguments:
+    values       -- The values column by column (array).
+    width        -- The number of columns (int).
+    height       -- The number of rows (int).
+
+    Return:
+    The columns of the tile (list of lists).
+    """
+
+    return [values[k*height:(k+1)*height].tolist() for k in range(width)]
+
+# -------------------------------------------------------------------
+class IterationWriter(object):
+    """
+    This class writes an iteration file. The tiles are written one at a time
+    in any order, so a render can be saved while it is calculated. The index is
+    written when the writer is closed.
+    """
+
+    def __init__(self, output, plotRange, noPixels, depth, kernel=None,
+                 precision="double", juliaC=None, distance=False, tileSize=64,
+                 floatPlane=None, compress=True):
+        """
+        Constructor.
+
+        Arguments:
+        output       -- The file name (string) or a binary file object to
+                        write to, which need not be seekable.
+        plotRange    -- The range in the complex plane of the image.
+        noPixels     -- The number of pixels per image side (int).
+        depth        -- The max number of iterations (int).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (Kernel).
+        precision    -- The precision of the calculation (string).
+        juliaC       -- The constant of the Julia set, or None (complex).
+        distance     -- The image is in distance estimation mode (bool).
+        tileSize     -- The side length of the tiles (int).
+        floatPlane   -- The name of the float plane, e.g. "distance", or None
+                        without a float plane (string).
+        compress     -- Compress the chunks (bool).
+        """
+
+        if kernel is None:
+            kernel = MB.mandelbrotKernel
+
+        # The iteration numbers fit in 16 bits for all usual depths
+        countType = "uint16"
+        if (depth >= 2**16):
+            countType = "uint32"
+
+        self.noPixels = noPixels
+        self.tileSize = tileSize
+        self.countCode = countTypes[countType]
+        self.floatPlane = floatPlane
+        self.compress = compress
+
+        if juliaC is not None:
+            juliaC = [juliaC.real,juliaC.imag]
+        self.header = {"corner": [plotRange.corner.real,plotRange.corner.imag],
+                       "zSize": plotRange.zSize,
+                       "noPixels": noPixels,
+                       "depth": depth,
+                       "kernel": kernel.name,
+                       "precision": precision,
+                       "juliaC": juliaC,
+                       "distance": bool(distance),
+                       "tileSize": tileSize,
+                       "countType": countType,
+                       "floatPlane": floatPlane,
+                       "compression": "zlib" if compress else "none"}
+
+        # Open the file
+        self.ownFile = not hasattr(output,"write")
+        if self.ownFile:
+            output = open(output,"wb")
+        self.file = output
+        self.position = 0
+        self.index = []
+
+        # Write the header
+        header = json.dumps(self.header,sort_keys=True).encode("utf-8")
+        self.write(startStruct.pack(fileMagic,fileVersion,len(header)))
+        self.write(header)
+        self.write(b"\0"*padding(self.position))
+
+    def write(self, data):
+        """
+        Write to the file and keep track of the position.
+
+        Arguments:
+        data         -- The data (bytes).
+        """
+
+        self.file.write(data)
+        self.position += len(data)
+
+    def writeTile(self, i0, j0, iterations, floats=None):
+        """
+        Write a tile.
+
+        Arguments:
+        i0, j0       -- The pixel of the tile corner (int).
+        iterations   -- The iteration buffer of the tile, indexed from the tile
+                        corner (list of lists).
+        floats       -- The float buffer of the tile, needed if the file has a
+                        float plane (list of lists).
+        """
+
+        width = len(iterations)
+        height = len(iterations[0])
+
+        # Pack the planes
+        counts = array(self.countCode)
+        for column in iterations:
+            counts.extend(column)
+        data = arrayToBytes(counts)
+
+        if self.floatPlane is not None:
+            values = array(floatType)
+            for column in floats:
+                values.extend(column)
+            data += arrayToBytes(values)
+
+        if self.compress:
+            data = zlib.compress(data)
+
+        # Write the chunk
+        self.index.append((i0,i0+width,j0,j0+height,self.position))
+        self.write(tileStruct.pack(tileMagic,i0,i0+width,j0,j0+height,len(data)))
+        self.write(data)
+        self.write(b"\0"*padding(len(data)))
+
+    def writeBuffer(self, iterations, floats=None):
+        """
+        Write a whole iteration buffer split into tiles.
+
+        Arguments:
+        iterations   -- The iteration buffer of the image (list of lists).
+        floats       -- The float buffer of the image, needed if the file has a
+                        float plane (list of lists).
+        """
+
+        size = self.tileSize
+        for j0 in range(0,self.noPixels,size):
+            j1 = min(j0+size,self.noPixels)
+            for i0 in range(0,self.noPixels,size):
+                i1 = min(i0+size,self.noPixels)
+
+                tileFloats = None
+                if floats is not None:
+                    tileFloats = [column[j0:j1] for column in floats[i0:i1]]
+                self.writeTile(i0,j0,[column[j0:j1] for column in iterations[i0:i1]],
+                        tileFloats)
+
+    def close(self):
+        """
+        Write the index and close the file.
+        """
+
+        if self.file is None:
+            return
+
+        indexOffset = self.position
+        for i0, i1, j0, j1, offset in self.index:
+            self.write(indexStruct.pack(indexMagic,i0,i1,j0,j1,offset))
+        self.write(endStruct.pack(indexOffset,len(self.index),endMagic))
+
+        if self.ownFile:
+            self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# -------------------------------------------------------------------
+class IterationReader(object):
+    """
+    This class reads an iteration file. Tiles are read by random access
+    through the index, or one after another with readTiles, which also works
+    for files that are not seekable.
+    """
+
+    def __init__(self, source):
+        """
+        Constructor.
+
+        Arguments:
+        source       -- The file name (string) or a binary file object to
+                        read from.
+        """
+
+        self.ownFile = not hasattr(source,"read")
+        if self.ownFile:
+            source = open(source,"rb")
+        self.file = source
+        self.map = None
+        self.index = None
+
+        # Read the header
+        magic, version, size = startStruct.unpack(self.read(startStruct.size))
+        if (magic != fileMagic):
+            raise ValueError("Not an iteration file")
+        if (version > fileVersion):
+            raise ValueError("Unsupported iteration file version %d" % version)
+        self.header = json.loads(self.read(size).decode("utf-8"))
+        self.read(padding(startStruct.size + size))
+
+        # The first chunk, and if the file has been read by random access
+        self.dataStart = startStruct.size + size + padding(startStruct.size + size)
+        self.moved = False
+
+        # Header values
+        self.plotRange = MB.PlotRange(complex(*self.header["corner"]),
+                self.header["zSize"])
+        self.noPixels = self.header["noPixels"]
+        self.depth = self.header["depth"]
+        self.kernel = self.header["kernel"]
+        self.precision = self.header["precision"]
+        self.juliaC = None
+        if self.header["juliaC"] is not None:
+            self.juliaC = complex(*self.header["juliaC"])
+        self.distance = self.header["distance"]
+        self.tileSize = self.header["tileSize"]
+        self.floatPlane = self.header["floatPlane"]
+        self.countCode = countTypes[self.header["countType"]]
+        self.compressed = (self.header["compression"] == "zlib")
+
+    def read(self, size):
+        """
+        Read from the file.
+
+        Arguments:
+        size         -- The number of bytes (int).
+
+        Return:
+        The data (bytes). A ValueError is raised if the file ends.
+        """
+
+        data = self.file.read(size)
+        if (len(data) != size):
+            raise ValueError("Truncated iteration file")
+
+        return data
+
+    def readIndex(self):
+        """
+        Read the index at the end of the file.
+
+        Return:
+        The chunk offsets by tile corner (dict).
+        """
+
+        if self.index is None:
+            self.moved = True
+            self.file.seek(-endStruct.size,2)
+            indexOffset, noTiles, magic = endStruct.unpack(self.read(endStruct.size))
+            if (magic != endMagic):
+                raise ValueError("Iteration file without index")
+
+            self.file.seek(indexOffset)
+            data = self.read(noTiles*indexStruct.size)
+            self.index = {}
+            for k in range(noTiles):
+                magic, i0, i1, j0, j1, offset = indexStruct.unpack_from(data,
+                        k*indexStruct.size)
+                self.index[(i0,j0)] = (i0,i1,j0,j1,offset)
+
+        return self.index
+
+    def tiles(self):
+        """
+        Get the tiles of the file.
+
+        Return:
+        The tiles [i0,i1,j0,j1] (list of lists).
+        """
+
+        return sorted([list(entry[:4]) for entry in self.readIndex().values()],
+                key=lambda tile: (tile[2],tile[0]))
+
+    def decode(self, i0, i1, j0, j1, data):
+        """
+        Decode the data of a chunk.
+
+        Return:
+        The iteration buffer and the float buffer, None without a float plane,
+        of the tile (tuple).
+        """
+
+        if self.compressed:
+            data = zlib.decompress(data)
+
+        width = i1 - i0
+        height = j1 - j0
+        counts = bytesToArray(self.countCode,data[:width*height*
+                array(self.countCode).itemsize])
+        iterations = toColumns(counts,width,height)
+
+        floats = None
+        if self.floatPlane is not None:
+            values = bytesToArray(floatType,data[width*height*
+                    array(self.countCode).itemsize:])
+            floats = toColumns(values,width,height)
+
+        return iterations, floats
+
+    def readTile(self, i0, j0):
+        """
+        Read a tile by random access.
+
+        Arguments:
+        i0, j0       -- The pixel of the tile corner (int).
+
+        Return:
+        The iteration buffer and the float buffer, None without a float plane,
+        of the tile, indexed from the tile corner (tuple).
+        """
+
+        ti0, ti1, tj0, tj1, offset = self.readIndex()[(i0,j0)]
+        self.moved = True
+        self.file.seek(offset)
+        magic, ti0, ti1, tj0, tj1, size = tileStruct.unpack(self.read(tileStruct.size))
+
+        return self.decode(ti0,ti1,tj0,tj1,self.read(size))
+
+    def readTiles(self):
+        """
+        Read the tiles one after another in the order of the file.
+
+        Return:
+        A generator of the tiles [i0,i1,j0,j1] with their iteration and float
+        buffers (tuples).
+        """
+
+        if self.moved:
+            self.file.seek(self.dataStart)
+            self.moved = False
+
+        while True:
+            start = self.file.read(4)
+            if (start != tileMagic):
+                break
+
+            magic, i0, i1, j0, j1, size = tileStruct.unpack(start +
+                    self.read(tileStruct.size-4))
+            data = self.read(size)
+            self.read(padding(size))
+
+            iterations, floats = self.decode(i0,i1,j0,j1,data)
+            yield [i0,i1,j0,j1], iterations, floats
+
+    def readBuffer(self):
+        """
+        Read the whole image.
+
+        Return:
+        The iteration buffer and the float buffer, None without a float plane,
+        of the image (tuple).
+        """
+
+        iterations = [[0]*self.noPixels for i in range(self.noPixels)]
+        floats = None
+        if self.floatPlane is not None:
+            floats = [[0.]*self.noPixels for i in range(self.noPixels)]
+
+        for tile, tileIterations, tileFloats in self.readTiles():
+            i0, i1, j0, j1 = tile
+            for k in range(i1-i0):
+                iterations[i0+k][j0:j1] = tileIterations[k]
+                if floats is not None:
+                    floats[i0+k][j0:j1] = tileFloats[k]
+
+        return iterations, floats
+
+    def tileView(self, i0, j0):
+        """
+        Get the iteration numbers of a tile of an uncompressed file without
+        copying them. The file is mapped into memory and the view refers to
+        the mapped chunk.
+
+        Arguments:
+        i0, j0       -- The pixel of the tile corner (int).
+
+        Return:
+        The iteration numbers of the tile column by column (memoryview). The
+        view must be released before the reader is closed. A ValueError is
+        raised for compressed files.
+
+        On Python 2 the mapped file has no memoryview, the view is then a
+        buffer of the little endian bytes of the numbers instead, which e.g.
+        numpy.frombuffer reads without copying.
+        """
+
+        if self.compressed:
+            raise ValueError("No memory mapped tiles in a compressed file")
+        if (sys.byteorder != "little"):
+            raise ValueError("No memory mapped tiles on a big endian machine")
+
+        ti0, ti1, tj0, tj1, offset = self.readIndex()[(i0,j0)]
+        if self.map is None:
+            self.map = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+
+        start = offset + tileStruct.size
+        size = (ti1-ti0)*(tj1-tj0)*array(self.countCode).itemsize
+        try:
+            view = memoryview(self.map)
+        except TypeError:
+            # Python 2
+            return buffer(self.map,start,size)
+
+        return view[start:start+size].cast(self.countCode)
+
+    def close(self):
+        """
+        Close the file.
+        """
+
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.ownFile and (self.file is not None):
+            self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# -------------------------------------------------------------------
+def saveIterations(fileName, mandelbrotImage, tileSize=64, compress=True):
+    """
+    Save the iteration buffer of a MandelbrotImage, and the distances in
+    distance estimation mode.
+
+    Arguments:
+    fileName     -- The file name (string).
+    mandelbrotImage -- The image (MandelbrotImage).
+    tileSize     -- The side length of the tiles (int).
+    compress     -- Compress the chunks (bool).
+    """
+
+    image = mandelbrotImage
+    floatPlane = None
+    if image.distances is not None:
+        floatPlane = "distance"
+
+    with IterationWriter(fileName,image.plotRange,image.noPixels,image.depth,
+            image.kernel,image.precision,image.juliaC,image.distances is not None,
+            tileSize,floatPlane,compress) as writer:
+        writer.writeBuffer(image.iterations,image.distances)
+
+# -------------------------------------------------------------------
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser(description="Mandelbrot iteration files")
+    commands = parser.add_subparsers(dest="command")
+
+    infoParser = commands.add_parser("info",help="Show the header of a file")
+    infoParser.add_argument("input")
+
+    colorParser = commands.add_parser("color",help="Color a file into a PPM image")
+    colorParser.add_argument("input")
+    colorParser.add_argument("output")
+    colorParser.add_argument("--intensity",type=int,default=200)
+    colorParser.add_argument("--scheme",default="Classic",help="The color scheme")
+    colorParser.add_argument("--gradients",default=None,
+            help="A JSON file with gradients to use as color schemes")
+    args = parser.parse_args()
+
+    if (args.command == "info"):
+        with IterationReader(args.input) as reader:
+            print(json.dumps(reader.header,indent=2,sort_keys=True))
+            print("tiles: %d" % len(reader.tiles()))
+
+    elif (args.command == "color"):
+        from mandelserver import toPPM
+
+        if args.gradients is not None:
+            MB.loadGradients(args.gradients)
+
+        with IterationReader(args.input) as reader:
+            iterations, floats = reader.readBuffer()
+            colorMap = MB.ColorMap()
+            colorMap.generate(reader.depth,args.intensity,args.scheme)
+
+        with open(args.output,"wb") as f:
+            f.write(toPPM(iterations,colorMap))
+
+    else:
+        parser.print_help()
@@ -7,10 +7,16 @@ interactive tool for exploring the complexities of the graphical representation
 of the Mandelbrot set.
 """
 
+import time
+
+# The start of the application, for the startup benchmark
+startTime = time.time()
+
 import sys
+import argparse
+from math import log10
 from PySide import QtGui
 from PySide import QtCore
-from scipy import log10
 
 import mandelbrot as MB
 
@@ -159,12 +165,58 @@ class MCoordConverter(QtCore.QObject):
         return self.__str__()
 
 
+# -------------------------------------------------------------------
+class MRenderThread(QtCore.QThread):
+    """
+    This class generates an image in a thread of its own, so the window is
+    repainted and handles events while the image is generated. The image is
+    handed to the GUI thread by the imageSignal, the image is None if the
+    render was cancelled.
+
+    The Mandelbrot object must not be used by the GUI thread until the thread
+    is finished.
+    """
+
+    # Class attributes
+    imageSignal = QtCore.Signal()
+
+    def __init__(self,mandelbrotImage,args,parent=None):
+        """
+        Constructor.
+
+        Parameters:
+        mandelbrotImage -- The Mandelbrot object generating the image, its last
+                           image guides the generation (MB.MandelbrotImage).
+        args            -- The arguments of MB.MandelbrotImage.zoom (tuple).
+        """
+        super(MRenderThread,self).__init__(parent)
+
+        self.mandelbrotImage = mandelbrotImage
+        self.args = args
+        self.image = None
+
+    def run(self):
+        """
+        Generate the image.
+        """
+
+        try:
+            self.image = self.mandelbrotImage.zoom(*self.args)
+        except MB.RenderCancelled:
+            self.image = None
+        self.imageSignal.emit()
+
+
 # -------------------------------------------------------------------
 class MScene(QtGui.QGraphicsScene):
     """
     Reimplementing the QGraphicsScene for better event control.
     """
 
+    # Class attributes
+    previewSignal = QtCore.Signal()
+    imageSignal = QtCore.Signal()
+
     def __init__(self,parent=None):
         """
         Constructor.
@@ -173,15 +225,132 @@ class MScene(QtGui.QGraphicsScene):
 
         # Init color map
         self.colorMap = MB.ColorMap()
+        self.scheme = "Classic"
 
         # Init Mandelbrot object
         self.mandelbrotImage = MB.MandelbrotImage()
 
-        # Generate initial image
-        self.generateImage()
+        # There is no image until the initial image is generated
+        self.pixmapItem = None
+        self.renderThread = None
+        self.screenPos = MCoordConverter()
+        self.screenPos.setPlotArea(complex(-2.,2.),4.,500)
+
+        # Generate initial image when the event loop is running, so the window
+        # is shown at once
+        QtCore.QTimer.singleShot(0,self.progressiveImage)
+
+    def progressiveImage(self,upperLeft=complex(-2.,2.),width=4.,depth=200,intensity=200,
+                         noPixels=500,juliaC=None,kernel=None,distance=False,coarse=8):
+        """
+        Generate the image in two passes. A coarse image with 1/coarse of the
+        pixels per side is generated and shown upscaled first. The image is
+        then generated in full size in a MRenderThread, using the coarse image
+        to speed up the generation like when zooming.
+
+        The function returns when the full size image is started. The window
+        handles events while the image is generated. A new image asked for by
+        the user cancels it, see cancelRender, and a new color scheme is used
+        when it is finished.
+
+        Parameters:
+        upperLeft    -- The upper left corner of the complex plane to generate (complex)
+        width        -- The width of the complex plane to generate (float)
+        depth        -- The number of max iterations (int).
+        intensity    -- Intensity of the colors in the color map. [0,255] (int).
+        noPixels     -- The size of the bitmap [noPixels x noPixels] (int).
+        juliaC       -- The constant of the Julia set to generate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (MB.Kernel).
+        distance     -- Show the estimated distance to the border of the set
+                        (bool).
+        coarse       -- The pixel size of the coarse image (int).
+        """
+
+        self.cancelRender()
+
+        # Let the window be shown before the work starts
+        QtGui.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+
+        # Set plot area
+        self.screenPos = MCoordConverter()
+        self.screenPos.setPlotArea(upperLeft, width, noPixels)
+
+        # Create a color map
+        self.colorMap.generate(depth,intensity,self.scheme)
+
+        # Generate and show the coarse image
+        plotRange = MB.PlotRange(upperLeft,width)
+        image = self.mandelbrotImage.generate(max(1,noPixels//coarse),self.colorMap,
+                plotRange,depth,juliaC,kernel,distance)
+        self.showImage(image.scaled(noPixels,noPixels))
+        self.previewSignal.emit()
+
+        # Generate the full size image guided by the coarse image
+        self.mandelbrotImage.cancelled = False
+        self.mandelbrotImage.columnProgress = True
+        self.renderThread = MRenderThread(self.mandelbrotImage,(noPixels,self.colorMap,
+                plotRange,depth,juliaC,kernel,distance))
+        self.renderThread.imageSignal.connect(self.finishRender)
+        self.renderThread.start()
+
+    @QtCore.Slot()
+    def finishRender(self):
+        """
+        Show the image of the render thread when it is finished. The coarse
+        image is left if the render was cancelled.
+        """
+
+        if self.renderThread is None:
+            return
+
+        # The signal is sent just before the thread ends
+        self.renderThread.wait()
+        image = self.renderThread.image
+        self.renderThread = None
+        self.mandelbrotImage.columnProgress = False
+        self.mandelbrotImage.cancelled = False
+        if image is None:
+            return
+
+        # Setup scene
+        self.showImage(image)
+        self.imageSignal.emit()
+
+        # The color scheme may have been changed meanwhile
+        if (self.colorMap.scheme != self.scheme):
+            self.recolorImage(self.scheme)
+
+    @QtCore.Slot()
+    def cancelRender(self):
+        """
+        Cancel the render thread. This is called before the Mandelbrot object
+        is used again and only waits until the thread has finished its current
+        column.
+        """
+
+        if self.renderThread is not None:
+            self.mandelbrotImage.cancelled = True
+            self.renderThread.wait()
+            self.finishRender()
+
+    def showImage(self,image):
+        """
+        Show an image in the scene. The scene rect is set to the image, so an
+        image dragged outside of it does not grow the scene and shift the
+        following images.
+
+        Parameters:
+        image        -- The image to show (QImage).
+        """
+
+        self.clear()
+        self.pixmapItem = self.addPixmap(QtGui.QPixmap.fromImage(image))
+        self.setSceneRect(0,0,image.width(),image.height())
 
     def generateImage(self,upperLeft=complex(-2.,2.),width=4.,depth=200,intensity=200,
-                      noPixels=500):
+                      noPixels=500,juliaC=None,kernel=None,distance=False):
         """
         This function contains all for generating the image in the scene.
 
@@ -193,22 +362,132 @@ class MScene(QtGui.QGraphicsScene):
                         of colors in the color map [0,..] (int).
         intensity    -- Intensity of the colors in the color map. [0,255] (int).
         noPixels     -- The size of the bitmap [noPixels x noPixels] (int).
+        juliaC       -- The constant of the Julia set to generate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (MB.Kernel).
+        distance     -- Show the estimated distance to the border of the set
+                        (bool).
         """
 
+        self.cancelRender()
+
         # Set plot area
         self.screenPos = MCoordConverter()
         self.screenPos.setPlotArea(upperLeft, width, noPixels)
 
         # Create a color map
-        self.colorMap.generate(depth,intensity)
+        self.colorMap.generate(depth,intensity,self.scheme)
 
         # Create a image of the Mandelbrot set
         plotRange = MB.PlotRange(upperLeft,width)
-        image = self.mandelbrotImage.generate(noPixels,self.colorMap,plotRange,depth)
+        image = self.mandelbrotImage.generate(noPixels,self.colorMap,plotRange,depth,
+                juliaC,kernel,distance)
 
         # Setup scene
-        self.clear()
-        self.addPixmap(QtGui.QPixmap.fromImage(image))
+        self.showImage(image)
+
+    def zoomImage(self,upperLeft,width,depth,intensity,noPixels,juliaC=None,
+                  kernel=None,distance=False):
+        """
+        Generate an image of a region inside the current image. The current
+        image is used for showing an upscaled preview at once and for speeding
+        up the generation of the new image.
+
+        Parameters:
+        upperLeft    -- The upper left corner of the complex plane to generate (complex)
+        width        -- The width of the complex plane to generate (float)
+        depth        -- The number of max iterations when calculating the
+                        Mandelbrot iterations (int).
+        intensity    -- Intensity of the colors in the color map. [0,255] (int).
+        noPixels     -- The size of the bitmap [noPixels x noPixels] (int).
+        juliaC       -- The constant of the Julia set to generate, or None for
+                        the Mandelbrot set (complex).
+        kernel       -- The kernel of the fractal, None for the Mandelbrot set
+                        (MB.Kernel).
+        distance     -- Show the estimated distance to the border of the set
+                        (bool).
+        """
+
+        self.cancelRender()
+
+        # Set plot area
+        self.screenPos = MCoordConverter()
+        self.screenPos.setPlotArea(upperLeft, width, noPixels)
+
+        # Create a color map
+        self.colorMap.generate(depth,intensity,self.scheme)
+
+        # Show the preview while the new image is generated
+        plotRange = MB.PlotRange(upperLeft,width)
+        image = self.mandelbrotImage.preview(noPixels,self.colorMap,plotRange,depth,
+                juliaC,kernel,distance)
+        if image is not None:
+            self.showImage(image)
+            QtGui.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+
+        # Create a image of the Mandelbrot set
+        image = self.mandelbrotImage.zoom(noPixels,self.colorMap,plotRange,depth,juliaC,
+                kernel,distance)
+
+        # Setup scene
+        self.showImage(image)
+
+    def panImage(self,dx,dy):
+        """
+        Move the current image by (dx,dy) pixels. Only the part of the image
+        exposed by the move is generated, the rest is reused.
+
+        The depth, intensity, image size, Julia set constant, kernel and mode
+        are the ones used for the current image.
+
+        Parameters:
+        dx           -- Pixels to move the image content to the right (int).
+        dy           -- Pixels to move the image content downwards (int).
+
+        Return:
+        The upper left corner of the new plot area (complex).
+        """
+
+        self.cancelRender()
+
+        # Move the image
+        image = self.mandelbrotImage.pan(dx,dy,self.colorMap)
+
+        # Set plot area
+        plotRange = self.mandelbrotImage.plotRange
+        self.screenPos.setPlotArea(plotRange.corner, plotRange.zSize,
+                self.mandelbrotImage.noPixels)
+
+        # Setup scene
+        self.showImage(image)
+
+        return plotRange.corner
+
+    def recolorImage(self,scheme):
+        """
+        Paint the current image again with another color scheme. Nothing is
+        calculated, so the colors change at once. The scheme is also used for
+        the following images.
+
+        Parameters:
+        scheme       -- The name of a registered color scheme (string).
+        """
+
+        self.scheme = scheme
+        if self.renderThread is not None:
+            # Recolored when the render thread is finished
+            return
+        if self.mandelbrotImage.iterations is None:
+            return
+
+        # Create a color map with the depth and intensity of the image
+        self.colorMap.generate(self.mandelbrotImage.depth,
+                self.colorMap.palette.intensity,self.scheme)
+        image = self.mandelbrotImage.recolor(self.colorMap)
+
+        # Setup scene
+        self.showImage(image)
 
 
 # -------------------------------------------------------------------
@@ -219,6 +498,7 @@ class MView(QtGui.QGraphicsView):
 
     # Class attributes
     mPosSignal = QtCore.Signal(QtCore.QPointF)
+    juliaSignal = QtCore.Signal(object)
 
     def __init__(self,parent=None):
         """
@@ -236,8 +516,9 @@ class MView(QtGui.QGraphicsView):
         # Add a rubber band object to the view
         self.rubberBand = QtGui.QRubberBand(QtGui.QRubberBand.Line,self)
 
-        # Mouse press indicator
+        # Mouse press indicators
         self.mousePress = False
+        self.panPress = False
 
         # Initialize all other attributes used in the class
         self.origin = QtCore.QPointF(0,0)
@@ -255,8 +536,19 @@ class MView(QtGui.QGraphicsView):
         self.intensity = 200
         self.noPixels = 500
 
+        # The constant of the Julia set shown, None when showing the Mandelbrot
+        # set
+        self.juliaC = None
+
+        # The kernel of the fractal
+        self.kernel = MB.mandelbrotKernel
+
+        # Distance estimation mode
+        self.distance = False
+
         # Create a history list; I don't like the initiation!
-        self.history = [[complex(-2.,2.),4.,self.depth,self.intensity,self.noPixels]]
+        self.history = [[complex(-2.,2.),4.,self.depth,self.intensity,self.noPixels,
+                         self.juliaC,self.kernel,self.distance]]
 
     @QtCore.Slot(int)
     def setDepth(self,depth):
@@ -292,11 +584,47 @@ class MView(QtGui.QGraphicsView):
 
         self.noPixels = int(noPixels)
 
+    @QtCore.Slot(str)
+    def setKernel(self,name):
+        """
+        Set the kernel property for the scene.
+
+        Parameters:
+        name         --- The name of a registered kernel (string).
+        """
+
+        self.kernel = MB.getKernel(str(name))
+
+    @QtCore.Slot(str)
+    def setScheme(self,name):
+        """
+        Set the color scheme for the scene and repaint the image with it.
+
+        Parameters:
+        name         --- The name of a registered color scheme (string).
+        """
+
+        self.scene.recolorImage(str(name))
+
+    @QtCore.Slot(bool)
+    def setDistance(self,distance):
+        """
+        Set the distance estimation mode for the scene.
+
+        Parameters:
+        distance     --- Show the estimated distance to the border of the set
+                         (bool).
+        """
+
+        self.distance = bool(distance)
+
     def mousePressEvent(self,event):
         """
         Overloaded version of mouse press event handler.
 
-        This handles both left and right click events.
+        This handles both left and right click events. A left click with the
+        control key pressed in the Mandelbrot set shows the Julia set of the
+        clicked point.
 
         Arguments:
         event -- The event handled by this function.
@@ -307,7 +635,24 @@ class MView(QtGui.QGraphicsView):
         """
 
         # Check which mouse button is pressed
-        if (event.button() == QtCore.Qt.MouseButton.LeftButton):
+        if ((event.button() == QtCore.Qt.MouseButton.LeftButton) and
+            (event.modifiers() & QtCore.Qt.ControlModifier)):
+            # Show the Julia set of the clicked point
+            if (self.juliaC is None):
+                self.sPos.setPixelCoord(self.mapToScene(event.pos()))
+                self.juliaC = self.sPos.getComplex()
+
+                # Generate the new image
+                self.scene.generateImage(complex(-2.,2.),4.,
+                        self.depth,self.intensity,self.noPixels,self.juliaC,self.kernel,
+                        self.distance)
+
+                # Add to history
+                self.history.append([complex(-2.,2.),4.,
+                        self.depth,self.intensity,self.noPixels,self.juliaC,self.kernel,
+                        self.distance])
+
+        elif (event.button() == QtCore.Qt.MouseButton.LeftButton):
             # If mouse press is on
             self.mousePress = True
 
@@ -324,15 +669,23 @@ class MView(QtGui.QGraphicsView):
                 # Pop the current image
                 self.history.pop()
 
-                # Get the previous one
-                prev = self.history.pop()
+                # Get the previous one, which is shown again
+                prev = self.history[-1]
 
                 # Generate a new image
-                self.scene.generateImage(prev[0],prev[1],prev[2],prev[3],prev[4])
+                self.juliaC = prev[5]
+                self.scene.generateImage(prev[0],prev[1],prev[2],prev[3],prev[4],
+                        prev[5],prev[6],prev[7])
 
             else:
                 print("Warning: Cannot go further back in history!")
 
+        elif ((event.button() == QtCore.Qt.MouseButton.MiddleButton) and
+              (self.scene.pixmapItem is not None)):
+            # Start dragging the image
+            self.panPress = True
+            self.origin = event.pos()
+
 
     def mouseMoveEvent(self,event):
         """
@@ -348,11 +701,14 @@ class MView(QtGui.QGraphicsView):
         # Get mouse position
         pos = event.pos()
 
-        # Setup local conversion object
-        self.sPos.setPixelCoord(pos)
+        # Setup local conversion object, in scene coordinates
+        self.sPos.setPixelCoord(self.mapToScene(pos))
 
-        # Emit signal
+        # Emit signals
         self.mPosSignal.emit(self.sPos.getPixelCoord())
+        if ((self.juliaC is None) and not (self.mousePress or self.panPress)):
+            # No Julia set preview while dragging, it would slow the dragging down
+            self.juliaSignal.emit(self.sPos.getComplex())
 
         # Check if mouse is pressed
         if(self.mousePress):
@@ -382,6 +738,11 @@ class MView(QtGui.QGraphicsView):
             # Update rubber band geometry
             self.rubberBand.setGeometry(QtCore.QRect(self.origin,pos).normalized())
 
+        # Check if the image is dragged
+        if(self.panPress):
+            # Move the current image along with the mouse pointer
+            self.scene.pixmapItem.setOffset(QtCore.QPointF(pos - self.origin))
+
     def mouseReleaseEvent(self,event):
         """
         Overloaded version of mouse release event handler.
@@ -391,7 +752,8 @@ class MView(QtGui.QGraphicsView):
         """
 
         # Check which button was pressed
-        if (event.button() == QtCore.Qt.MouseButton.LeftButton):
+        if ((event.button() == QtCore.Qt.MouseButton.LeftButton) and
+            self.mousePress):
             # Get mouse position
             pos = event.pos()
 
@@ -399,23 +761,62 @@ class MView(QtGui.QGraphicsView):
             self.mousePress = False
 
             # Trigger generation of new image
-            corner = self.sPos.setPixelCoord(self.rubberBand.pos())
+            corner = self.sPos.setPixelCoord(self.mapToScene(self.rubberBand.pos()))
             corner = self.sPos.getComplex()
             width = self.rubberBand.size().width()
             width = width*self.sPos.scaleFactor
 
             if (width != 0.):
                 # Generate the new image
-                self.scene.generateImage(corner,width,
-                        self.depth,self.intensity,self.noPixels)
+                self.scene.zoomImage(corner,width,
+                        self.depth,self.intensity,self.noPixels,self.juliaC,self.kernel,
+                        self.distance)
 
                 # Add to history
                 self.history.append([corner,width,
-                        self.depth,self.intensity,self.noPixels])
+                        self.depth,self.intensity,self.noPixels,self.juliaC,self.kernel,
+                        self.distance])
 
             # Hide the rubber band
             self.rubberBand.hide()
 
+        elif (event.button() == QtCore.Qt.MouseButton.MiddleButton):
+            # Mouse press is off
+            self.panPress = False
+
+            # Pixels the image has been dragged
+            dx = int(event.pos().x() - self.origin.x())
+            dy = int(event.pos().y() - self.origin.y())
+
+            self.scene.cancelRender()
+            mandelbrotImage = self.scene.mandelbrotImage
+            if (((dx != 0) or (dy != 0)) and (mandelbrotImage.plotRange is not None)):
+                # The view shown, which need not be the last one in the history
+                plotRange = mandelbrotImage.plotRange
+                width = plotRange.zSize
+
+                kernel, distance = mandelbrotImage.resolveMode(self.kernel,self.distance)
+                if ((mandelbrotImage.depth == self.depth) and
+                    (self.scene.colorMap.palette.intensity == self.intensity) and
+                    (mandelbrotImage.noPixels == self.noPixels) and
+                    (mandelbrotImage.juliaC == self.juliaC) and
+                    (mandelbrotImage.kernel.name == kernel.name) and
+                    ((mandelbrotImage.distances is not None) == distance)):
+                    # Reuse the current image
+                    corner = self.scene.panImage(dx,dy)
+                else:
+                    # The image properties have changed, generate a new image
+                    scale = self.sPos.scaleFactor
+                    corner = plotRange.corner - complex(dx*scale,-dy*scale)
+                    self.scene.generateImage(corner,width,
+                            self.depth,self.intensity,self.noPixels,self.juliaC,
+                            self.kernel,self.distance)
+
+                # Add to history
+                self.history.append([corner,width,
+                        self.depth,self.intensity,self.noPixels,self.juliaC,self.kernel,
+                        self.distance])
+
         else:
             None
 
@@ -433,7 +834,87 @@ class MView(QtGui.QGraphicsView):
         curr = self.history[-1]
 
         # Generate a new image
-        self.scene.generateImage(curr[0],curr[1],self.depth,self.intensity,self.noPixels)
+        self.scene.generateImage(curr[0],curr[1],self.depth,self.intensity,self.noPixels,
+                curr[5],self.kernel,self.distance)
+
+        # Replace the current image in the history
+        self.history[-1] = [curr[0],curr[1],self.depth,self.intensity,self.noPixels,
+                curr[5],self.kernel,self.distance]
+
+# -------------------------------------------------------------------
+class MJuliaPreview(QtGui.QLabel):
+    """
+    This class shows a small Julia set image for the point under the mouse
+    pointer in the Mandelbrot set view. The image is small and shallow enough
+    to be regenerated while the mouse moves.
+    """
+
+    def __init__(self,parent=None,noPixels=128,depth=40):
+        """
+        Constructor.
+
+        Arguments:
+        parent          -- Parent widget
+        noPixels        -- The size of the preview [noPixels x noPixels] (int).
+        depth           -- The number of max iterations of the preview (int).
+
+        Return:
+        None.
+        """
+        super(MJuliaPreview,self).__init__(parent)
+
+        # Preview properties
+        self.noPixels = noPixels
+        self.depth = depth
+        self.plotRange = MB.PlotRange(complex(-2.,2.),4.)
+        self.setFixedSize(noPixels,noPixels)
+
+        # The Julia set constant and kernel to show next
+        self.juliaC = None
+        self.kernel = MB.mandelbrotKernel
+
+        # Init color map and Mandelbrot object
+        self.colorMap = MB.ColorMap()
+        self.colorMap.generate(depth,200)
+        self.mandelbrotImage = MB.MandelbrotImage()
+
+        # Timer collecting mouse movements, only the latest point is generated
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.generateImage)
+
+    @QtCore.Slot(object)
+    def setJuliaC(self,juliaC):
+        """
+        Set the constant of the Julia set to preview.
+
+        Parameters:
+        juliaC     -- The constant of the Julia set (complex).
+        """
+
+        self.juliaC = juliaC
+        if not self.timer.isActive():
+            self.timer.start(0)
+
+    @QtCore.Slot(str)
+    def setKernel(self,name):
+        """
+        Set the kernel of the Julia set to preview.
+
+        Parameters:
+        name       -- The name of a registered kernel (string).
+        """
+
+        self.kernel = MB.getKernel(str(name))
+
+    def generateImage(self):
+        """
+        Generate the preview image of the latest Julia set constant.
+        """
+
+        image = self.mandelbrotImage.generate(self.noPixels,self.colorMap,
+                self.plotRange,self.depth,self.juliaC,self.kernel)
+        self.setPixmap(QtGui.QPixmap.fromImage(image))
 
 # -------------------------------------------------------------------
 class MPanel(QtGui.QWidget):
@@ -458,10 +939,19 @@ class MPanel(QtGui.QWidget):
         self.depthLE.setText("200")
         self.intensityLE = QtGui.QLineEdit()
         self.intensityLE.setText("200")
+        self.kernelCB = QtGui.QComboBox()
+        self.kernelCB.addItems(MB.kernelNames)
+        self.schemeCB = QtGui.QComboBox()
+        self.schemeCB.addItems(MB.colorSchemeNames)
+        self.distanceCB = QtGui.QCheckBox("Distance estimation")
+
+        # Create Julia set preview
+        self.juliaPreview = MJuliaPreview()
 
         # Create vertical layout
         vbox = QtGui.QVBoxLayout()
         vbox.addWidget(self.imageProperties())
+        vbox.addWidget(self.juliaPreviewGroup())
 
         # Create progress bar
         self.pbar = QtGui.QProgressBar()
@@ -510,11 +1000,26 @@ class MPanel(QtGui.QWidget):
         intensityBox.addWidget(intensityLabel)
         intensityBox.addWidget(self.intensityLE)
 
+        # Kernel input
+        kernelLabel = QtGui.QLabel("Fractal")
+        kernelBox = QtGui.QHBoxLayout()
+        kernelBox.addWidget(kernelLabel)
+        kernelBox.addWidget(self.kernelCB)
+
+        # Color scheme input
+        schemeLabel = QtGui.QLabel("Colors")
+        schemeBox = QtGui.QHBoxLayout()
+        schemeBox.addWidget(schemeLabel)
+        schemeBox.addWidget(self.schemeCB)
+
         # Create vertical layout
         vbox = QtGui.QVBoxLayout()
         vbox.addLayout(pixelsBox)
         vbox.addLayout(depthBox)
         vbox.addLayout(intensityBox)
+        vbox.addLayout(kernelBox)
+        vbox.addLayout(schemeBox)
+        vbox.addWidget(self.distanceCB)
 
         # Create group object
         newGroup = QtGui.QGroupBox()
@@ -525,6 +1030,25 @@ class MPanel(QtGui.QWidget):
         # Return group
         return newGroup
 
+    def juliaPreviewGroup(self):
+        """
+        This method generates the GUI for the Julia set preview.
+        """
+
+        # Create vertical layout
+        vbox = QtGui.QVBoxLayout()
+        vbox.addWidget(QtGui.QLabel("Ctrl+click to show the Julia set"))
+        vbox.addWidget(self.juliaPreview)
+
+        # Create group object
+        newGroup = QtGui.QGroupBox()
+        newGroup.setAlignment(QtCore.Qt.AlignLeft)
+        newGroup.setTitle("Julia Set Preview")
+        newGroup.setLayout(vbox)
+
+        # Return group
+        return newGroup
+
     @QtCore.Slot(int)
     def setProgressMax(self,itrMax):
         self.pbar.setMaximum(itrMax)
@@ -563,6 +1087,11 @@ class MCentralWidget(QtGui.QWidget):
         self.panel.pixelsLE.textChanged.connect(self.view.setNoPixels)
         self.view.scene.mandelbrotImage.sender.itrSignal.connect(self.panel.setProgress)
         self.view.scene.mandelbrotImage.sender.maxSignal.connect(self.panel.setProgressMax)
+        self.view.juliaSignal.connect(self.panel.juliaPreview.setJuliaC)
+        self.panel.kernelCB.activated[str].connect(self.view.setKernel)
+        self.panel.kernelCB.activated[str].connect(self.panel.juliaPreview.setKernel)
+        self.panel.distanceCB.toggled.connect(self.view.setDistance)
+        self.panel.schemeCB.activated[str].connect(self.view.setScheme)
 
 # -------------------------------------------------------------------
 class MStatusBar(QtGui.QStatusBar):
@@ -585,6 +1114,10 @@ class MStatusBar(QtGui.QStatusBar):
         # Coordinate conversion object
         self.sPos = MCoordConverter()
 
+        # Label with the statistics of the last render
+        self.statsLabel = QtGui.QLabel()
+        self.addPermanentWidget(self.statsLabel)
+
     @QtCore.Slot(QtCore.QPointF)
     def showPosition(self,pixelPos):
         """
@@ -603,31 +1136,140 @@ class MStatusBar(QtGui.QStatusBar):
         # Emit signal
         self.showMessage(statusStr)
 
+    @QtCore.Slot(object)
+    def showStats(self,stats):
+        """
+        Custom slot for showing the statistics of the last render.
+
+        Parameters:
+        stats      -- The statistics of the render (RenderStats).
+        """
+
+        text = "%.2f s, %d%% calculated" % (stats.totalTime,
+                100*stats.calculated/max(1,stats.noPixels))
+        rate = stats.iterationsPerSecond()
+        if rate is not None:
+            text += ", %.1f M itr/s" % (rate*1e-6)
+        if stats.peakMemory is not None:
+            text += ", %.0f MB" % stats.peakMemory
+
+        self.statsLabel.setText(text)
+        self.statsLabel.setToolTip(str(stats))
+
+# -------------------------------------------------------------------
+class MStartupBenchmark(QtCore.QObject):
+    """
+    This class measures the startup time of the application, from the start
+    of this module to the window being painted, the coarse preview of the
+    initial image being shown and the initial image being finished. The times
+    are printed and the application quits when the initial image is finished.
+    """
+
+    def __init__(self,widget,scene):
+        """
+        Constructor.
+
+        Parameters:
+        widget       -- The widget to watch for the first paint (QWidget).
+        scene        -- The scene generating the initial image (MScene).
+        """
+        super(MStartupBenchmark,self).__init__()
+
+        self.windowTime = None
+        self.previewTime = None
+
+        widget.installEventFilter(self)
+        scene.previewSignal.connect(self.previewShown)
+        scene.imageSignal.connect(self.imageShown)
+
+    def eventFilter(self,obj,event):
+        """
+        Record the time of the first paint.
+        """
+
+        if (self.windowTime is None) and (event.type() == QtCore.QEvent.Paint):
+            self.windowTime = time.time() - startTime
+
+        return False
+
+    @QtCore.Slot()
+    def previewShown(self):
+        """
+        Record the time of the coarse preview.
+        """
+
+        self.previewTime = time.time() - startTime
+
+    @QtCore.Slot()
+    def imageShown(self):
+        """
+        Print the startup times and quit.
+        """
+
+        imageTime = time.time() - startTime
+        if self.windowTime is None:
+            print("Window visible:  not painted before the first image")
+        else:
+            print("Window visible:  %.3f s" % self.windowTime)
+        print("Preview shown:   %.3f s" % self.previewTime)
+        print("First image:     %.3f s" % imageTime)
+
+        QtCore.QTimer.singleShot(0,QtGui.QApplication.instance().quit)
+
 # -------------------------------------------------------------------
 if __name__ == "__main__":
+    # Parse arguments, the remaining arguments are left to Qt
+    parser = argparse.ArgumentParser(description="Explore the Mandelbrot set")
+    parser.add_argument("--profile",nargs="?",const="-",default=None,
+            help="Profile the application, and save the statistics to the file given")
+    parser.add_argument("--gradients",default=None,
+            help="A JSON file with gradients to use as color schemes")
+    parser.add_argument("--benchmark",action="store_true",
+            help="Print the startup times and quit when the first image is shown")
+    args, qtArgs = parser.parse_known_args()
+
     # The application
     # Test if there already is an instance
     try:
-        app = QtGui.QApplication(sys.argv)
+        app = QtGui.QApplication(sys.argv[:1] + qtArgs)
     except RuntimeError:
         app = QtGui.QApplication.instance()
 
+    # Load the color gradients before the panel lists the schemes
+    if args.gradients is not None:
+        MB.loadGradients(args.gradients)
+
     # Status bar
     statBar = MStatusBar()
 
     # Central widget
     centralWidget = MCentralWidget()
 
-    # Connect mouse position with status bar
+    # Connect mouse position and render statistics with status bar
     centralWidget.view.mPosSignal.connect(statBar.showPosition)
+    centralWidget.view.scene.mandelbrotImage.sender.statsSignal.connect(statBar.showStats)
 
     # Main window
     mainWindow = QtGui.QMainWindow()
     mainWindow.setCentralWidget(centralWidget)
     mainWindow.setStatusBar(statBar)
 
+    # Measure the startup
+    if args.benchmark:
+        benchmark = MStartupBenchmark(centralWidget.view.viewport(),
+                centralWidget.view.scene)
+
     # Show the window
     mainWindow.show()
 
-    # The main event loop
-    sys.exit(app.exec_())
+    # Stop a render in progress before the application quits
+    app.aboutToQuit.connect(centralWidget.view.scene.cancelRender)
+
+    # The main event loop, optionally profiled
+    if args.profile is None:
+        sys.exit(app.exec_())
+
+    fileName = None
+    if (args.profile != "-"):
+        fileName = args.profile
+    sys.exit(MB.profileCall(app.exec_,(),fileName))
@@ -0,0 +1,670 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+This module is a local render server for the Mandelbrot module. Clients post
+render jobs over HTTP and get the rendered image back as a binary PPM image.
+
+A job is a JSON object with the following keys, all optional:
+kernel       -- The name of a registered kernel (string).
+corner       -- The upper left corner of the plot area [real,imag].
+zSize        -- The side length of the plot square (float).
+noPixels     -- The size of the image [noPixels x noPixels] (int).
+depth        -- The number of max iterations and colors (int).
+intensity    -- The intensity of the colors in the color map [0,255] (int).
+scheme       -- The name of a registered color scheme (string).
+juliaC       -- The constant of a Julia set [real,imag], or null.
+distance     -- Use distance estimation mode (bool).
+
+The jobs are rendered by a pool of worker processes. Identical jobs that
+arrive while the job is rendered wait for the same result, and all results are
+kept in a cache addressed by the content of the job.
+
+Requests:
+POST /render   -- Render the job in the request body.
+GET /metrics   -- Queue depth, latency and cache hit rate as JSON.
+
+Example:
+python mandelserver.py --port 8800
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from multiprocessing import Pool
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from httplib import HTTPConnection
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from http.client import HTTPConnection
+
+import mandelbrot as MB
+
+# The default job
+defaultJob = {"kernel": MB.mandelbrotKernel.name,
+              "corner": [-2.,2.],
+              "zSize": 4.,
+              "noPixels": 500,
+              "depth": 200,
+              "intensity": 200,
+              "scheme": "Classic",
+              "juliaC": None,
+              "distance": False}
+
+# The largest image size and depth of a job, larger jobs could exhaust the
+# memory of a worker
+maxPixels = 16384
+maxDepth = 1000000
+
+# -------------------------------------------------------------------
+def normalizeJob(job, maxPixels=maxPixels, maxDepth=maxDepth):
+    """
+    Complete a job with the default values and convert the values to their
+    types. The normalized job is used as the cache key, so equal jobs written
+    differently get the same key.
+
+    Arguments:
+    job          -- The job (dict).
+    maxPixels    -- The largest allowed image size (int).
+    maxDepth     -- The largest allowed depth (int).
+
+    Return:
+    The normalized job (dict). A ValueError is raised for an invalid job.
+    """
+
+    unknown = set(job) - set(defaultJob)
+    if unknown:
+        raise ValueError("Unknown job keys: %s" % ", ".join(sorted(unknown)))
+
+    out = dict(defaultJob)
+    out.update(job)
+
+    if out["kernel"] not in MB.kernels:
+        raise ValueError("Unknown kernel: %s" % out["kernel"])
+    out["corner"] = [float(out["corner"][0]),float(out["corner"][1])]
+    out["zSize"] = float(out["zSize"])
+    out["noPixels"] = int(out["noPixels"])
+    out["depth"] = int(out["depth"])
+    out["intensity"] = int(out["intensity"])
+    out["scheme"] = str(out["scheme"])
+    if out["scheme"] not in MB.colorSchemes:
+        raise ValueError("Unknown color scheme: %s" % out["scheme"])
+    if out["juliaC"] is not None:
+        out["juliaC"] = [float(out["juliaC"][0]),float(out["juliaC"][1])]
+    out["distance"] = bool(out["distance"])
+
+    if (out["zSize"] <= 0.) or (out["noPixels"] < 1) or (out["depth"] < 2):
+        raise ValueError("Invalid plot range, image size or depth")
+    if (out["noPixels"] > maxPixels) or (out["depth"] > maxDepth):
+        raise ValueError("Image size or depth too large, the limits are %d and %d" %
+                (maxPixels,maxDepth))
+
+    return out
+
+def jobKey(job):
+    """
+    The content address of a normalized job.
+
+    Arguments:
+    job          -- The normalized job (dict).
+
+    Return:
+    The key (string).
+    """
+
+    return hashlib.sha1(json.dumps(job,sort_keys=True).encode("utf-8")).hexdigest()
+
+def jobView(job, noPixels=None, distance=None):
+    """
+    The view of a normalized job, with the kernel, mode and precision resolved
+    by viewSettings.
+
+    Arguments:
+    job          -- The normalized job (dict).
+    noPixels     -- The image size to choose the precision for, None for the
+                    size of the job (int).
+    distance     -- Use distance estimation mode, None for the mode of the job
+                    (bool).
+
+    Return:
+    The plot range, Julia set constant, kernel, distance estimation mode and
+    precision (tuple).
+    """
+
+    if noPixels is None:
+        noPixels = job["noPixels"]
+    if distance is None:
+        distance = job["distance"]
+
+    plotRange = MB.PlotRange(complex(*job["corner"]),job["zSize"])
+    juliaC = None
+    if job["juliaC"] is not None:
+        juliaC = complex(*job["juliaC"])
+
+    kernel, distance, precision = MB.MandelbrotImage().viewSettings(noPixels,
+            plotRange,juliaC,MB.getKernel(job["kernel"]),distance)
+
+    return plotRange, juliaC, kernel, distance, precision
+
+def toPPM(iterations, colorMap):
+    """
+    Paint an iteration buffer with a color map into a binary PPM image.
+
+    Arguments:
+    iterations   -- The iteration buffer (list of lists).
+    colorMap     -- The color map object.
+
+    Return:
+    The PPM image (bytes).
+    """
+
+    # The bytes of each color, taken from the packed colors of the palette
+    packed = bytearray(colorMap.palette.packed)
+    pixels = [bytes(packed[k:k+3]) for k in range(0,len(packed),3)]
+
+    noPixels = len(iterations)
+    data = bytearray(("P6\n%d %d\n255\n" % (noPixels,noPixels)).encode("ascii"))
+    for j in range(noPixels):
+        data.extend(b"".join([pixels[column[j]-1] for column in iterations]))
+
+    return bytes(data)
+
+def renderJob(job):
+    """
+    Render a normalized job. This function is run in the worker processes.
+
+    Arguments:
+    job          -- The normalized job (dict).
+
+    Return:
+    The PPM image (bytes).
+    """
+
+    # Calculate the iterations
+    plotRange, juliaC, kernel, distance, precision = jobView(job)
+    iterations, distances = MB.MandelbrotImage().calcView(plotRange,job["noPixels"],
+            job["depth"],None,juliaC,kernel,distance,precision)
+
+    # Paint
+    colorMap = MB.ColorMap()
+    colorMap.generate(job["depth"],job["intensity"],job["scheme"])
+
+    return toPPM(iterations,colorMap)
+
+def renderJobSafe(job):
+    """
+    Render a normalized job and catch the errors, so the waiting requests are
+    always woken up.
+
+    Arguments:
+    job          -- The normalized job (dict).
+
+    Return:
+    The tuple (PPM image, None) or (None, error message).
+    """
+
+    try:
+        return (renderJob(job), None)
+    except Exception as error:
+        return (None, "%s: %s" % (type(error).__name__,error))
+
+# -------------------------------------------------------------------
+class ResultCache(object):
+    """
+    This class is a cache of rendered images addressed by the job key. The
+    least recently used images are evicted when the cache exceeds its size.
+    """
+
+    def __init__(self, maxBytes=64*1024*1024):
+        """
+        Constructor.
+
+        Arguments:
+        maxBytes     -- The maximum total size of the cached images (int).
+        """
+
+        self.maxBytes = maxBytes
+        self.noBytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached image.
+
+        Arguments:
+        key          -- The job key (string).
+
+        Return:
+        The image (bytes) or None if not cached.
+        """
+
+        with self.lock:
+            data = self.entries.pop(key,None)
+            if data is not None:
+                # Mark as most recently used
+                self.entries[key] = data
+
+            return data
+
+    def put(self, key, data):
+        """
+        Add an image to the cache and evict old images if needed.
+
+        Arguments:
+        key          -- The job key (string).
+        data         -- The image (bytes).
+        """
+
+        # Images larger than the cache are not cached
+        if (len(data) > self.maxBytes):
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.noBytes -= len(self.entries.pop(key))
+
+            self.entries[key] = data
+            self.noBytes += len(data)
+
+            # Evict the least recently used images
+            while (self.noBytes > self.maxBytes):
+                oldKey, oldData = self.entries.popitem(last=False)
+                self.noBytes -= len(oldData)
+
+    def __len__(self):
+        return len(self.entries)
+
+# -------------------------------------------------------------------
+class PendingJob(object):
+    """
+    This class is a job being rendered. Requests for the same job wait for
+    the result of the first request.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+# -------------------------------------------------------------------
+class RenderServer(object):
+    """
+    This class renders jobs on a pool of worker processes. Identical jobs in
+    flight are coalesced and the results are kept in a ResultCache.
+
+    The class does not depend on HTTP and is also used directly by
+    LocalRenderClient.
+    """
+
+    def __init__(self, processes=None, cacheBytes=64*1024*1024, timeout=600.,
+                 maxPixels=4096, maxDepth=100000):
+        """
+        Constructor.
+
+        Arguments:
+        processes    -- The number of worker processes, None for the number of
+                        CPUs (int).
+        cacheBytes   -- The maximum size of the result cache (int).
+        timeout      -- The time to wait for a job in seconds. A job whose worker
+                        died is never finished, so its requests fail after the
+                        time out (float).
+        maxPixels    -- The largest image size of a job (int).
+        maxDepth     -- The largest depth of a job (int).
+        """
+
+        self.pool = Pool(processes)
+        self.cache = ResultCache(cacheBytes)
+        self.timeout = timeout
+        self.maxPixels = maxPixels
+        self.maxDepth = maxDepth
+
+        # Jobs in flight by key
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.noRequests = 0
+        self.noHits = 0
+        self.noCoalesced = 0
+        self.noRendered = 0
+        self.noErrors = 0
+        self.noTimeouts = 0
+        self.totalLatency = 0.
+        self.maxLatency = 0.
+
+    def render(self, job):
+        """
+        Render a job.
+
+        Arguments:
+        job          -- The job (dict).
+
+        Return:
+        The PPM image (bytes). A ValueError is raised for an invalid job and a
+        RuntimeError for errors in the worker or if the job times out.
+        """
+
+        start = time.time()
+        job = normalizeJob(job,self.maxPixels,self.maxDepth)
+        key = jobKey(job)
+
+        try:
+            # Answer from the cache
+            data = self.cache.get(key)
+            if data is not None:
+                with self.lock:
+                    self.noHits += 1
+                return data
+
+            # Join a job in flight or start a new one
+            with self.lock:
+                pending = self.pending.get(key)
+                if pending is None:
+                    pending = PendingJob()
+                    self.pending[key] = pending
+                    self.pool.apply_async(renderJobSafe,(job,),
+                            callback=lambda result: self.finish(key,pending,*result))
+                else:
+                    self.noCoalesced += 1
+
+            # Wait for the result
+            if not pending.done.wait(self.timeout):
+                self.expire(key,pending)
+            if pending.error is not None:
+                raise RuntimeError(pending.error)
+            return pending.result
+
+        finally:
+            latency = time.time() - start
+            with self.lock:
+                self.noRequests += 1
+                self.totalLatency += latency
+                self.maxLatency = max(self.maxLatency,latency)
+
+    def finish(self, key, pending, data, error):
+        """
+        Store the result of a job and wake up the waiting requests. This is
+        called from the result thread of the pool.
+
+        Arguments:
+        key          -- The job key (string).
+        pending      -- The job in flight (PendingJob).
+        data         -- The PPM image (bytes) or None.
+        error        -- The error message of the job or None (string).
+        """
+
+        if error is None:
+            self.cache.put(key,data)
+
+        with self.lock:
+            # The job may have timed out and been started again
+            if self.pending.get(key) is pending:
+                del self.pending[key]
+            if error is None:
+                self.noRendered += 1
+            else:
+                self.noErrors += 1
+
+            if not pending.done.is_set():
+                pending.result = data
+                pending.error = error
+                pending.done.set()
+
+    def expire(self, key, pending):
+        """
+        Give up a job that has not finished within the time out, e.g. because
+        its worker died. The waiting requests fail and the next request for the
+        job starts it again.
+
+        Arguments:
+        key          -- The job key (string).
+        pending      -- The job in flight (PendingJob).
+        """
+
+        with self.lock:
+            if pending.done.is_set():
+                return
+
+            if self.pending.get(key) is pending:
+                del self.pending[key]
+            self.noTimeouts += 1
+
+            pending.error = "The job timed out after %g s" % self.timeout
+            pending.done.set()
+
+    def metrics(self):
+        """
+        Get the server metrics.
+
+        Return:
+        The metrics (dict).
+        """
+
+        with self.lock:
+            noRequests = self.noRequests
+            meanLatency = 0.
+            hitRate = 0.
+            if (noRequests > 0):
+                meanLatency = self.totalLatency/noRequests
+                hitRate = self.noHits/float(noRequests)
+
+            return {"queueDepth": len(self.pending),
+                    "requests": noRequests,
+                    "cacheHits": self.noHits,
+                    "cacheHitRate": hitRate,
+                    "coalesced": self.noCoalesced,
+                    "rendered": self.noRendered,
+                    "errors": self.noErrors,
+                    "timeouts": self.noTimeouts,
+                    "meanLatency": meanLatency,
+                    "maxLatency": self.maxLatency,
+                    "cacheEntries": len(self.cache),
+                    "cacheBytes": self.cache.noBytes}
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+
+        self.pool.terminate()
+        self.pool.join()
+
+# -------------------------------------------------------------------
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    This class handles the HTTP requests of the render server.
+    """
+
+    def do_POST(self):
+        """
+        Render the job in the request body.
+        """
+
+        if (self.path != "/render"):
+            self.send_error(404)
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length",0))
+            job = json.loads(self.rfile.read(length).decode("utf-8"))
+            data = self.server.renderServer.render(job)
+        except (ValueError, TypeError, KeyError) as error:
+            self.send_error(400,str(error))
+            return
+        except RuntimeError as error:
+            self.send_error(500,str(error))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type","image/x-portable-pixmap")
+        self.send_header("Content-Length",str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """
+        Send the server metrics.
+        """
+
+        if (self.path != "/metrics"):
+            self.send_error(404)
+            return
+
+        data = json.dumps(self.server.renderServer.metrics()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type","application/json")
+        self.send_header("Content-Length",str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """
+        Requests are not logged.
+        """
+
+        None
+
+# -------------------------------------------------------------------
+class RenderHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    This class is the HTTP server, handling each request in a thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, renderServer):
+        """
+        Constructor.
+
+        Arguments:
+        address      -- The (host,port) to listen on (tuple).
+        renderServer -- The render server (RenderServer).
+        """
+
+        HTTPServer.__init__(self,address,RenderRequestHandler)
+        self.renderServer = renderServer
+
+# -------------------------------------------------------------------
+class RenderClient(object):
+    """
+    This class is a client of the render server.
+    """
+
+    def __init__(self, host="localhost", port=8800):
+        """
+        Constructor.
+
+        Arguments:
+        host         -- The server host (string).
+        port         -- The server port (int).
+        """
+
+        self.host = host
+        self.port = port
+
+    def request(self, method, path, body=None):
+        """
+        Send a request to the server.
+
+        Return:
+        The response body (bytes). A ValueError is raised for failed requests.
+        """
+
+        connection = HTTPConnection(self.host,self.port)
+        try:
+            connection.request(method,path,body)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+
+        if (response.status != 200):
+            raise ValueError("Render server error %d: %s" % (response.status,
+                    response.reason))
+
+        return data
+
+    def render(self, job):
+        """
+        Render a job.
+
+        Arguments:
+        job          -- The job (dict).
+
+        Return:
+        The PPM image (bytes).
+        """
+
+        return self.request("POST","/render",json.dumps(job))
+
+    def metrics(self):
+        """
+        Get the server metrics.
+
+        Return:
+        The metrics (dict).
+        """
+
+        return json.loads(self.request("GET","/metrics").decode("utf-8"))
+
+# -------------------------------------------------------------------
+class LocalRenderClient(object):
+    """
+    This class has the interface of RenderClient but uses a render server in
+    the same process, without HTTP.
+    """
+
+    def __init__(self, renderServer):
+        """
+        Constructor.
+
+        Arguments:
+        renderServer -- The render server (RenderServer).
+        """
+
+        self.renderServer = renderServer
+
+    def render(self, job):
+        return self.renderServer.render(job)
+
+    def metrics(self):
+        return self.renderServer.metrics()
+
+# -------------------------------------------------------------------
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser(description="Mandelbrot render server")
+    parser.add_argument("--host",default="localhost")
+    parser.add_argument("--port",type=int,default=8800)
+    parser.add_argument("--processes",type=int,default=None)
+    parser.add_argument("--cache-mb",type=int,default=64)
+    parser.add_argument("--timeout",type=float,default=600.)
+    parser.add_argument("--max-pixels",type=int,default=4096)
+    parser.add_argument("--max-depth",type=int,default=100000)
+    args = parser.parse_args()
+
+    # Start the server
+    renderServer = RenderServer(args.processes,args.cache_mb*1024*1024,args.timeout,
+            args.max_pixels,args.max_depth)
+    httpServer = RenderHTTPServer((args.host,args.port),renderServer)
+    print("Render server listening on %s:%d" % (args.host,args.port))
+
+    try:
+        httpServer.serve_forever()
+    except KeyboardInterrupt:
+        None
+    finally:
+        httpServer.server_close()
+        renderServer.close()
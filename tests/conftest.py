@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+"""
+Configuration of the tests. The modules are run from the repository root, so
+the root is added to the module search path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
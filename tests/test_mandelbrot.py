@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the reuse of the last image of a MandelbrotImage, of cancelling a
+render and of loading gradients.
+"""
+
+import pytest
+
+# The mandelbrot module needs PySide for the images
+pytest.importorskip("PySide")
+import mandelbrot as MB
+
+
+# -------------------------------------------------------------------
+plotRange = MB.PlotRange(complex(-2.,2.),4.)
+
+def newImage(kernel=None, distance=False):
+    colorMap = MB.ColorMap()
+    colorMap.generate(60,200)
+    mandelbrotImage = MB.MandelbrotImage()
+    mandelbrotImage.generate(20,colorMap,plotRange,60,None,kernel,distance)
+    return mandelbrotImage
+
+def test_isInside():
+    mandelbrotImage = newImage()
+    inner = MB.PlotRange(complex(-1.,1.),1.)
+    assert mandelbrotImage.isInside(inner,60)
+    assert not mandelbrotImage.isInside(inner,61)
+    assert not mandelbrotImage.isInside(inner,60,distance=True)
+    assert not mandelbrotImage.isInside(MB.PlotRange(complex(-3.,1.),1.),60)
+
+def test_isInsideWithoutDerivative():
+    # Distance estimation is turned off for kernels without a derivative, so
+    # asking for it again still reuses the image
+    kernel = MB.getKernel("Burning ship")
+    mandelbrotImage = newImage(kernel,True)
+    assert mandelbrotImage.distances is None
+    assert mandelbrotImage.isInside(plotRange,60,None,kernel,True)
+    assert mandelbrotImage.isInside(plotRange,60,None,kernel,False)
+    assert not mandelbrotImage.isInside(plotRange,60,None,None,True)
+
+def test_cancelledZoomKeepsView():
+    mandelbrotImage = newImage()
+    mandelbrotImage.cancelled = True
+    with pytest.raises(MB.RenderCancelled):
+        mandelbrotImage.zoom(40,MB.ColorMap(),plotRange,60)
+    assert mandelbrotImage.noPixels == 20
+    assert len(mandelbrotImage.iterations) == 20
+
+# -------------------------------------------------------------------
+def writeGradients(tmp_path, text):
+    fileName = str(tmp_path / "gradients.json")
+    with open(fileName,"w") as f:
+        f.write(text)
+    return fileName
+
+def test_loadGradients(tmp_path):
+    fileName = writeGradients(tmp_path,
+            '{"Test fire": [[1.0, 255, 255, 0], [0.0, 0, 0, 0]]}')
+    assert MB.loadGradients(fileName) == ["Test fire"]
+    assert "Test fire" in MB.colorSchemes
+
+@pytest.mark.parametrize("text", [
+    '[["Test list", [[0.0, 0, 0, 0], [1.0, 255, 255, 255]]]]',
+    '{"Test good": [[0.0, 0, 0, 0], [1.0, 255, 255, 255]], "Test bad": [[0.0, 0, 0]]}',
+    '{"Test good": [[0.0, 0, 0, 0], [1.0, 255, 255, 255]], "Test bad": 3}',
+    '{"Test good": [[0.0, 0, 0, 0], [1.0, 255, 255, 255]], "Test bad": [[0.0, 0, 0, 0]]}'])
+def test_loadGradientsInvalid(tmp_path, text):
+    # An invalid file registers none of its gradients
+    assert MB.loadGradients(writeGradients(tmp_path,text)) == []
+    assert "Test good" not in MB.colorSchemes
+    assert "Test list" not in MB.colorSchemes
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the tile scheduling of the distributed renderer.
+"""
+
+import time
+
+import pytest
+
+# The mandelbrot module needs PySide for the images
+pytest.importorskip("PySide")
+import mandeldist as MD
+
+
+# -------------------------------------------------------------------
+def newQueue(noTiles, workers, slowTime=10.):
+    tiles = MD.TileQueue([[k,k+1,0,1] for k in range(noTiles)],slowTime)
+    for worker in workers:
+        tiles.addWorker(worker)
+    return tiles
+
+def test_failedTileGoesToAnotherWorker():
+    tiles = newQueue(2,["a","b"])
+
+    index = tiles.next("a")
+    tiles.fail(index,"a","bad")
+    assert tiles.error is None
+
+    # Worker a gets the other tile and worker b the failed one
+    assert tiles.next("a") != index
+    assert tiles.next("b") == index
+
+    # The job fails when the tile has failed on all workers
+    tiles.fail(index,"b","bad")
+    assert tiles.error == "Tile [%d, %d, 0, 1] failed: bad" % (index,index+1)
+
+def test_workerErrorKeepsTile():
+    tiles = newQueue(1,["a","b"])
+
+    for k in range(5):
+        index = tiles.next("a")
+        tiles.fail(index,"a","Connection refused",tileError=False)
+    assert tiles.error is None
+
+    tiles.dropWorker("a")
+    assert tiles.error is None
+    assert tiles.complete(tiles.next("b"))
+    assert tiles.finished()
+
+def test_dropWorker():
+    tiles = newQueue(2,["a","b"])
+
+    # The tile failed on a, and b is dropped
+    tiles.fail(tiles.next("a"),"a","bad")
+    tiles.dropWorker("b")
+    assert tiles.error.startswith("Tile [0, 1, 0, 1] failed")
+
+    tiles = newQueue(1,["a"])
+    tiles.dropWorker("a")
+    assert tiles.error == "No tile workers left"
+
+def test_slowTile():
+    tiles = newQueue(1,["a","b"],slowTime=0.)
+
+    index = tiles.next("a")
+    time.sleep(0.01)
+    assert tiles.next("b") == index
+
+    # The tile is still running on b
+    tiles.fail(index,"a","timed out")
+    assert not tiles.waiting
+    assert tiles.error is None
+
+    assert tiles.complete(index)
+    assert not tiles.complete(index)
+    assert tiles.finished()
+
+def test_deadWorker():
+    processes, addresses = MD.startLocalWorkers(1)
+    try:
+        coordinator = MD.TileCoordinator([("localhost",1)] + addresses)
+        iterations, distances = coordinator.render({"noPixels": 64})
+
+        stats = coordinator.utilization()
+        assert stats[0]["tiles"] == 0
+        assert stats[1]["tiles"] == 4
+    finally:
+        MD.stopLocalWorkers(processes)
+
+def test_estimateTileCosts():
+    job = MD.normalizeJob({"noPixels": 64, "depth": 100})
+    tiles = MD.splitTiles(64,16)
+    costs = MD.estimateTileCosts(job,16)
+    assert len(costs) == len(tiles) == 16
+
+    # The corner tile is far outside the set and the tile at the origin
+    # covers much of the interior
+    corner = tiles.index([0,16,0,16])
+    interior = tiles.index([16,32,16,32])
+    assert costs[interior] > 10*costs[corner]
+
+    # The most expensive tiles are handed out first
+    order = sorted(range(len(costs)),key=lambda k: -costs[k])
+    queue = MD.TileQueue(tiles,10.,order)
+    queue.addWorker("a")
+    first = queue.next("a")
+    assert costs[first] == max(costs)
+    assert costs[queue.next("a")] >= costs[order[-1]]
+
+def test_utilization():
+    processes, addresses = MD.startLocalWorkers(2)
+    try:
+        coordinator = MD.TileCoordinator(addresses,tileSize=16,estimate=True)
+        coordinator.render({"noPixels": 64, "depth": 100})
+        report = coordinator.utilization()
+    finally:
+        MD.stopLocalWorkers(processes)
+
+    assert [stats["address"] for stats in report] == addresses
+    assert sum(stats["tiles"] for stats in report) == 16
+    for stats in report:
+        assert set(stats) == set(["address","tiles","failures","busy","compute",
+                                  "utilization","idleAtEnd"])
+        assert stats["failures"] == 0
+        assert 0. <= stats["compute"] <= stats["busy"] <= coordinator.renderTime
+        assert 0. <= stats["utilization"] <= 1.
+        assert 0. <= stats["idleAtEnd"] <= coordinator.renderTime
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the iteration file format.
+"""
+
+import io
+
+import pytest
+
+# The mandelbrot module needs PySide for the images
+pytest.importorskip("PySide")
+import mandelbrot as MB
+import mandelfile as MF
+
+
+# -------------------------------------------------------------------
+plotRange = MB.PlotRange(complex(-2.,2.),4.)
+noPixels = 50
+tileSize = 16
+
+def newBuffers(depth=200):
+    iterations = [[1 + (7919*i + 104729*j) % depth for j in range(noPixels)]
+                  for i in range(noPixels)]
+    floats = [[0.25*i - 0.5*j for j in range(noPixels)] for i in range(noPixels)]
+    return iterations, floats
+
+def writeFile(output, depth=200, floats=None, compress=True):
+    iterations, distances = newBuffers(depth)
+    floatPlane = None
+    if floats:
+        floatPlane = "distance"
+    else:
+        distances = None
+
+    with MF.IterationWriter(output,plotRange,noPixels,depth,None,"double",None,
+            floats,tileSize,floatPlane,compress) as writer:
+        writer.writeBuffer(iterations,distances)
+
+    return iterations, distances
+
+def tileOf(buffer, i0, j0):
+    return [column[j0:j0+tileSize] for column in buffer[i0:i0+tileSize]]
+
+@pytest.mark.parametrize("compress",[True,False])
+def test_roundTrip(tmpdir, compress):
+    fileName = str(tmpdir.join("test.mitr"))
+    iterations, distances = writeFile(fileName,compress=compress)
+
+    with MF.IterationReader(fileName) as reader:
+        assert reader.noPixels == noPixels
+        assert reader.depth == 200
+        assert reader.kernel == MB.mandelbrotKernel.name
+        assert reader.compressed == compress
+        assert reader.header["countType"] == "uint16"
+        assert (reader.plotRange.corner,reader.plotRange.zSize) == (plotRange.corner,4.)
+        assert len(reader.tiles()) == 16
+
+        readIterations, floats = reader.readBuffer()
+        assert readIterations == iterations
+        assert floats is None
+
+def test_floatPlane(tmpdir):
+    fileName = str(tmpdir.join("test.mitr"))
+    iterations, distances = writeFile(fileName,floats=True)
+
+    with MF.IterationReader(fileName) as reader:
+        assert reader.floatPlane == "distance"
+        assert reader.distance
+        readIterations, floats = reader.readBuffer()
+
+    # The floats are stored in single precision
+    assert readIterations == iterations
+    assert floats == distances
+
+def test_readTileThenTiles(tmpdir):
+    fileName = str(tmpdir.join("test.mitr"))
+    iterations, distances = writeFile(fileName)
+
+    with MF.IterationReader(fileName) as reader:
+        tile, floats = reader.readTile(32,16)
+        assert tile == tileOf(iterations,32,16)
+
+        # Reading all tiles starts over at the first tile
+        tiles = list(reader.readTiles())
+        assert len(tiles) == 16
+        assert tiles[0][0] == [0,16,0,16]
+        for (i0, i1, j0, j1), tile, floats in tiles:
+            assert tile == tileOf(iterations,i0,j0)
+
+def test_notSeekable():
+    output = io.BytesIO()
+    iterations, distances = writeFile(output)
+
+    class Source(object):
+        def __init__(self, data):
+            self.data = io.BytesIO(data)
+        def read(self, size):
+            return self.data.read(size)
+
+    reader = MF.IterationReader(Source(output.getvalue()))
+    tiles = list(reader.readTiles())
+    assert len(tiles) == 16
+    for (i0, i1, j0, j1), tile, floats in tiles:
+        assert tile == tileOf(iterations,i0,j0)
+
+def test_tileView(tmpdir):
+    fileName = str(tmpdir.join("test.mitr"))
+    iterations, distances = writeFile(fileName,compress=False)
+
+    with MF.IterationReader(fileName) as reader:
+        view = reader.tileView(16,48)
+        expected = [n for column in tileOf(iterations,16,48) for n in column]
+        assert view.tolist() == expected
+        view.release()
+
+        with pytest.raises(KeyError):
+            reader.tileView(8,8)
+
+    fileName = str(tmpdir.join("compressed.mitr"))
+    writeFile(fileName)
+    with MF.IterationReader(fileName) as reader:
+        with pytest.raises(ValueError):
+            reader.tileView(0,0)
+
+def test_uint32(tmpdir):
+    fileName = str(tmpdir.join("test.mitr"))
+    writeFile(fileName,depth=2**16-1)
+    with MF.IterationReader(fileName) as reader:
+        assert reader.header["countType"] == "uint16"
+
+    iterations, distances = writeFile(fileName,depth=2**16)
+    with MF.IterationReader(fileName) as reader:
+        assert reader.header["countType"] == "uint32"
+        assert reader.readBuffer()[0] == iterations
+
+    iterations, distances = writeFile(fileName,depth=100000)
+    assert max(max(column) for column in iterations) > 2**16
+    with MF.IterationReader(fileName) as reader:
+        assert reader.readBuffer()[0] == iterations
+
+def test_badFile():
+    with pytest.raises(ValueError):
+        MF.IterationReader(io.BytesIO(b"NOPE" + b"\0"*12))
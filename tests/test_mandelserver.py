@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the render server, used through LocalRenderClient.
+"""
+
+import time
+import threading
+
+import pytest
+
+# The mandelbrot module needs PySide for the images
+pytest.importorskip("PySide")
+import mandelserver as MS
+
+
+# -------------------------------------------------------------------
+class HeldPool(object):
+    """
+    A pool that holds the jobs until they are released, so the requests
+    arriving while a job is rendered can be controlled.
+    """
+
+    def __init__(self):
+        self.jobs = []
+
+    def apply_async(self, function, args, callback):
+        self.jobs.append((function,args,callback))
+
+    def release(self):
+        for function, args, callback in self.jobs:
+            callback(function(*args))
+        self.jobs = []
+
+    def terminate(self):
+        None
+
+    def join(self):
+        None
+
+def heldServer(**options):
+    """
+    A render server with a HeldPool instead of the worker processes.
+    """
+
+    renderServer = MS.RenderServer(1,**options)
+    renderServer.close()
+    renderServer.pool = HeldPool()
+    return renderServer
+
+def waitFor(condition, timeout=10.):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end
+        time.sleep(0.01)
+
+def renderThreads(client, job, noThreads):
+    """
+    Start threads rendering the same job.
+
+    Return:
+    The threads and the list the results are appended to (tuple).
+    """
+
+    results = []
+    def render():
+        try:
+            results.append(client.render(job))
+        except RuntimeError as error:
+            results.append(error)
+
+    threads = [threading.Thread(target=render) for k in range(noThreads)]
+    for thread in threads:
+        thread.start()
+
+    return threads, results
+
+
+# -------------------------------------------------------------------
+job = {"noPixels": 16, "depth": 50}
+
+def test_coalescing():
+    renderServer = heldServer()
+    client = MS.LocalRenderClient(renderServer)
+
+    # All requests wait for the same job
+    threads, results = renderThreads(client,job,4)
+    waitFor(lambda: client.metrics()["coalesced"] == 3)
+    assert len(renderServer.pool.jobs) == 1
+    assert client.metrics()["queueDepth"] == 1
+
+    renderServer.pool.release()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 4
+    assert all(result == results[0] for result in results)
+    assert results[0].startswith(b"P6\n16 16\n255\n")
+
+    metrics = client.metrics()
+    assert metrics["rendered"] == 1
+    assert metrics["queueDepth"] == 0
+
+    # The next request is answered from the cache
+    assert client.render(job) == results[0]
+    assert client.metrics()["cacheHits"] == 1
+
+def test_timeout():
+    renderServer = heldServer(timeout=0.2)
+    client = MS.LocalRenderClient(renderServer)
+
+    # The job is never finished, as when its worker dies
+    threads, results = renderThreads(client,job,2)
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result,RuntimeError) for result in results)
+    assert client.metrics()["queueDepth"] == 0
+    assert client.metrics()["timeouts"] == 1
+
+    # A late result of the old job does not disturb the new one
+    stale = renderServer.pool.jobs
+    renderServer.pool.jobs = []
+    threads, results = renderThreads(client,job,1)
+    waitFor(lambda: len(renderServer.pool.jobs) == 1)
+    function, args, callback = stale[0]
+    callback((None,"stale"))
+    assert client.metrics()["queueDepth"] == 1
+
+    renderServer.pool.release()
+    threads[0].join()
+    assert results[0].startswith(b"P6\n")
+
+def test_limits():
+    renderServer = heldServer(maxPixels=64,maxDepth=1000)
+    client = MS.LocalRenderClient(renderServer)
+
+    with pytest.raises(ValueError):
+        client.render({"noPixels": 65})
+    with pytest.raises(ValueError):
+        client.render({"depth": 1001})
+    with pytest.raises(ValueError):
+        client.render({"kernel": "Unknown"})
+    with pytest.raises(ValueError):
+        client.render({"scheme": "Unknown"})
+
+def test_toPPM():
+    colorMap = MS.MB.ColorMap()
+    colorMap.generate(50,200,"Fire")
+    iterations = [[1 + (3*i + j) % 50 for j in range(6)] for i in range(6)]
+
+    # Row by row as with getColor
+    expected = bytearray(b"P6\n6 6\n255\n")
+    for j in range(6):
+        for i in range(6):
+            expected.extend(colorMap.getColor(iterations[i][j]-1))
+
+    assert MS.toPPM(iterations,colorMap) == bytes(expected)
+
+def test_cacheEviction():
+    # Room for two images of 8 x 8 pixels
+    imageBytes = len(MS.renderJob(MS.normalizeJob({"noPixels": 8, "depth": 20})))
+    renderServer = MS.RenderServer(2,cacheBytes=2*imageBytes)
+    client = MS.LocalRenderClient(renderServer)
+
+    try:
+        jobs = [{"noPixels": 8, "depth": 20, "zSize": zSize} for zSize in [4.,3.,2.]]
+        images = [client.render(job) for job in jobs]
+        assert len(renderServer.cache) == 2
+        assert renderServer.cache.noBytes == 2*imageBytes
+
+        # The first image was evicted and is rendered again, which evicts the
+        # second image
+        assert client.render(jobs[0]) == images[0]
+        assert client.metrics()["rendered"] == 4
+
+        assert client.render(jobs[2]) == images[2]
+        assert client.metrics()["cacheHits"] == 1
+        assert client.render(jobs[1]) == images[1]
+        assert client.metrics()["rendered"] == 5
+    finally:
+        renderServer.close()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the deep zoom precision. The iteration numbers of the perturbation
+iterations are compared with a high precision reference calculated with the
+decimal module, and with the double precision iterations at a shallow zoom.
+"""
+
+from decimal import Decimal, localcontext
+
+import pytest
+
+# The mandelbrot module needs PySide for the images
+pytest.importorskip("PySide")
+import mandelbrot as MB
+
+
+# -------------------------------------------------------------------
+def decimalIterations(cReal, cImag, N, digits=60):
+    """
+    The Mandelbrot iterations in high precision, counted as in
+    mandelbrotIterations.
+
+    Arguments:
+    cReal, cImag -- The point (Decimal).
+    N            -- The maximum number of iterations (int).
+    digits       -- The number of digits of the calculation (int).
+
+    Return:
+    The number of iterations (int).
+    """
+
+    with localcontext() as context:
+        context.prec = digits
+
+        x = Decimal(0)
+        y = Decimal(0)
+        n = 0
+        while (x*x + y*y < 4) and (n < N):
+            n = n + 1
+            x, y = x*x - y*y + cReal, 2*x*y + cImag
+
+    return n
+
+def decimalView(plotRange, noPixels, N):
+    """
+    The iteration buffer of a view in high precision. The pixels are placed
+    relative to the plot range center as in the deep zoom precision.
+
+    Arguments:
+    plotRange    -- The range in the complex plane to plot.
+    noPixels     -- The number of pixels per bitmap side (int).
+    N            -- The maximum number of iterations (int).
+
+    Return:
+    The iteration buffer (list of lists).
+    """
+
+    cDelta = plotRange.zSize/float(noPixels)
+    half = Decimal(plotRange.zSize)/2
+    centerReal = Decimal(plotRange.corner.real) + half
+    centerImag = Decimal(plotRange.corner.imag) - half
+
+    iterations = []
+    for i in range(noPixels):
+        column = []
+        for j in range(noPixels):
+            delta = complex((0.5+i)*cDelta - 0.5*plotRange.zSize,
+                            0.5*plotRange.zSize - (0.5+j)*cDelta)
+            column.append(decimalIterations(centerReal + Decimal(delta.real),
+                    centerImag + Decimal(delta.imag),N))
+        iterations.append(column)
+
+    return iterations
+
+def compare(iterations, reference, tolerance):
+    """
+    Compare two iteration buffers.
+
+    Arguments:
+    iterations   -- The iteration buffer to check (list of lists).
+    reference    -- The reference iteration buffer (list of lists).
+    tolerance    -- The allowed difference of the iteration numbers (int).
+
+    Return:
+    The fraction of the pixels within the tolerance (float).
+    """
+
+    pixels = [(a,b) for c1, c2 in zip(iterations,reference) for a, b in zip(c1,c2)]
+    return sum(abs(a-b) <= tolerance for a, b in pixels)/float(len(pixels))
+
+
+# -------------------------------------------------------------------
+# A view of 1e-12 at the border of the seahorse valley, where double precision
+# can not resolve the pixels
+deepRange = MB.PlotRange(complex(-0.743234163145651 - 5e-13,0.13210373279183 + 5e-13),1e-12)
+deepDepth = 2000
+
+def test_choosePrecision():
+    mandelbrotImage = MB.MandelbrotImage()
+    assert mandelbrotImage.choosePrecision(16,deepRange) == "deep"
+    assert mandelbrotImage.choosePrecision(16,MB.PlotRange(complex(-2.,2.),4.)) == "double"
+
+def test_perturbationIterations():
+    mandelbrotImage = MB.MandelbrotImage()
+    orbit = mandelbrotImage.referenceOrbit(deepRange,deepDepth)
+
+    half = Decimal(deepRange.zSize)/2
+    for dc in [complex(0.,0.),complex(2e-13,-1e-13),complex(-4e-13,3e-13)]:
+        expected = decimalIterations(Decimal(deepRange.corner.real) + half + Decimal(dc.real),
+                Decimal(deepRange.corner.imag) - half + Decimal(dc.imag),deepDepth)
+        n = mandelbrotImage.perturbationIterations(dc,orbit,deepDepth)
+        assert abs(n - expected) <= 1
+
+def test_deepView():
+    noPixels = 12
+    mandelbrotImage = MB.MandelbrotImage()
+    iterations, distances = mandelbrotImage.calcView(deepRange,noPixels,deepDepth,
+            precision="deep")
+    reference = decimalView(deepRange,noPixels,deepDepth)
+
+    # The view is not uniform, so the pixels are resolved
+    assert len(set(n for column in reference for n in column)) > 10
+    assert compare(iterations,reference,1) >= 0.95
+
+def test_deepMatchesDouble():
+    plotRange = MB.PlotRange(complex(-0.7453,0.1127),0.0005)
+    noPixels = 24
+    depth = 400
+
+    mandelbrotImage = MB.MandelbrotImage()
+    double, distances = mandelbrotImage.calcView(plotRange,noPixels,depth)
+    deep, distances = mandelbrotImage.calcView(plotRange,noPixels,depth,
+            precision="deep")
+
+    assert compare(deep,double,0) >= 0.95
+    assert compare(deep,double,2) >= 0.99